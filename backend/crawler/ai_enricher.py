@@ -1,11 +1,13 @@
-import openai
+from llm_client import chat, usage_sink
+from enrichment_cache import get_cache, taxonomy_version, usage_cost
+from subcategory_classifier import CLASSIFIER_ENABLED, get_classifier
+from tag_image import image_part, prepare_tag_image
 from dotenv import load_dotenv
 import os
 import json
 load_dotenv()
 import re
 import psycopg2
-import httpx, base64
 
 conn = psycopg2.connect(
     dbname="projectdb",
@@ -29,18 +31,13 @@ rows = cur.fetchall()
 # Build list in required format
 categories = [[row[0], row[1]] for row in rows]
 
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
 MAX_DESCRIPTION_LEN = 1000
+MODEL = 'gpt-4o'
 
 subcategory_to_category = {sub: cat for sub, cat in categories}
+TAXONOMY_VERSION = taxonomy_version(subcategory_to_category)
 print(subcategory_to_category)
 
-def prepare_thingiverse_image(url: str) -> str:
-    resp = httpx.get(url, timeout=30)
-    b64_img = base64.b64encode(resp.content).decode("utf-8")
-    return f"data:image/jpeg;base64,{b64_img}"
-
 def extract_json_from_response(content):
     # Try to extract JSON block inside triple backticks
     match = re.search(r"```(?:json)?\s*(\{.*?\})\s*```", content, re.DOTALL)
@@ -54,7 +51,7 @@ def extract_json_from_response(content):
 
     return None
 
-def make_description(data):
+async def make_description(data):
     prompt = f"""
     Rewrite the following into a simple, enticing product description.
     You may use the title, description, and webpage on Source URL.
@@ -66,15 +63,15 @@ def make_description(data):
     Respond with the new description text
     """
 
-    response = openai.chat.completions.create(
-        model='gpt-4o',
+    response = await chat(
+        model=MODEL,
         messages = [{"role": "user", "content": prompt}],
         temperature=0.7
     )
 
     return response.choices[0].message.content.strip()
 
-def define_subcategory(data, subcategories):
+async def define_subcategory(data, subcategories):
     prompt = f"""
     Choose exactly one subcategory from this list (copy-past exactly, do NOT modify or invent): {subcategories}
 
@@ -84,18 +81,17 @@ def define_subcategory(data, subcategories):
     Respond only with the chosen subcategory(must match exactly one from the list).
     """
 
-    response = openai.chat.completions.create(
-        model='gpt-4o',
+    response = await chat(
+        model=MODEL,
         messages = [{"role": "user", "content": prompt}],
         temperature=0.7
     )
 
     return response.choices[0].message.content.strip()
 
-def generate_tags(image_url):
+async def generate_tags(image_url):
     prompt = f"""
-    Generate SEO-friendly tags focused only on the primary 3D object(s) in the image on this URL.
-    URL: {image_url}
+    Generate SEO-friendly tags focused only on the primary 3D object(s) in the attached image.
 
     Rules:
     - Exclude any environmental or background elements.
@@ -103,12 +99,12 @@ def generate_tags(image_url):
     - Return as a JSON list of strings.
     """
 
-    response = openai.chat.completions.create(
-        model="gpt-4o",
+    response = await chat(
+        model=MODEL,
         messages=[
             {"role": "user", "content": [
                 {"type": "text", "text": prompt},
-                {"type": "image_url", "image_url": {"url": image_url}}  # <-- send image here
+                image_part(image_url)
             ]}
         ],
         temperature=0.7
@@ -129,31 +125,149 @@ def generate_tags(image_url):
         tags = [t.strip().strip('"').strip("'") for t in raw.replace("[","").replace("]","").split(",") if t.strip()]
     return tags
 
-def enrich_data(data):
+ENRICHED_FIELDS = ("description", "subcategory", "tags")
+
+# "combined" asks for every field in one JSON response and only re-asks the
+# separate prompts for fields that came back missing or invalid; "separate"
+# is the original one-call-per-field path.
+ENRICH_MODE = os.getenv("ENRICH_MODE", "combined").lower()
+
+def combined_prompt(data, fields, subcategories):
+    parts = []
+    if "description" in fields:
+        parts.append('"description": a simple, enticing product description rewritten from the title, description and webpage on Source URL')
+    if "subcategory" in fields:
+        parts.append(f'"subcategory": exactly one subcategory copied from this list, not modified or invented: {subcategories}')
+    if "tags" in fields:
+        parts.append('"tags": a list of SEO-friendly tags for the primary 3D object(s) in the image only, '
+                     'excluding environmental or background elements, describing the object\'s type, material, shape, '
+                     'brand(if applicable), function and any notable design features relevant to 3D printing')
+    keys = "\n    - ".join(parts)
+    return f"""
+    Title: {data['title']}
+    Description: {data['description']}
+    Source URL: {data['source_url']}
+
+    Respond only with a JSON object with these keys:
+    - {keys}
+    """
+
+def validate_enrichment(result, fields, subcategories):
+    # Keeps only the fields that are present and well-formed.
+    valid = {}
+    description = result.get("description")
+    if "description" in fields and isinstance(description, str) and description.strip():
+        valid["description"] = description.strip()
+    subcategory = result.get("subcategory")
+    if "subcategory" in fields and isinstance(subcategory, str) and subcategory.strip() in subcategories:
+        valid["subcategory"] = subcategory.strip()
+    tags = result.get("tags")
+    if "tags" in fields and isinstance(tags, list) and tags and all(isinstance(tag, str) for tag in tags):
+        valid["tags"] = tags
+    return valid
+
+async def enrich_combined(data, fields, subcategories, image_url=None):
+    content = [{"type": "text", "text": combined_prompt(data, fields, subcategories)}]
+    if image_url is not None:
+        content.append(image_part(image_url))
+    response = await chat(
+        model=MODEL,
+        messages=[{"role": "user", "content": content}],
+        response_format={"type": "json_object"},
+        temperature=0.7
+    )
+    raw = response.choices[0].message.content
+    try:
+        result = json.loads(extract_json_from_response(raw) or raw)
+    except (TypeError, ValueError):
+        return {}
+    return validate_enrichment(result, fields, subcategories) if isinstance(result, dict) else {}
+
+async def enrich_separately(data, field, subcategories, image_url=None):
+    if field == "description":
+        return await make_description(data)
+    if field == "subcategory":
+        return await define_subcategory(data, subcategories)
+    return await generate_tags(image_url)
+
+def cache_inputs(data, field):
+    # Exactly what each prompt depends on. Tags are keyed by the source image
+    # URL, so a hit also skips downloading the Thingiverse image.
+    if field == "description":
+        return [data['title'], data['description'], data['source_url']]
+    if field == "subcategory":
+        return [data['title'], data['description'], TAXONOMY_VERSION]
+    return [data['image_urls'][0][0]]
+
+async def with_cost(coro):
+    sink = []
+    token = usage_sink.set(sink)
+    try:
+        result = await coro
+    finally:
+        usage_sink.reset(token)
+    return result, sum(usage_cost(prompt, completion) for prompt, completion in sink)
+
+async def enrich_data(data, fields=ENRICHED_FIELDS, mode=None):
+    # fields limits the LLM calls to the outputs that need regenerating, e.g.
+    # only "tags" when a recrawl finds new images but the same text.
     subcategories = list(subcategory_to_category.keys())
+    mode = mode or ENRICH_MODE
+    cache = get_cache()
+    keys = {field: cache.key(field, MODEL, cache_inputs(data, field)) for field in ENRICHED_FIELDS if field in fields}
+
+    results = {}
+    for field, key in keys.items():
+        cached = cache.get(key)
+        if cached is not None:
+            results[field] = cached
+    todo = [field for field in keys if field not in results]
+    if "subcategory" in todo and CLASSIFIER_ENABLED:
+        classifier = await get_classifier(TAXONOMY_VERSION)
+        subcategory = classifier.classify(data) if classifier is not None else None
+        if subcategory in subcategory_to_category:
+            results["subcategory"] = subcategory
+            todo.remove("subcategory")
+    image_url = await prepare_tag_image(data) if "tags" in todo else None
+
+    fresh = {}
+    if todo and mode == "combined":
+        try:
+            combined, cost = await with_cost(enrich_combined(data, todo, subcategories, image_url))
+            for field, value in combined.items():
+                fresh[field] = (value, cost / len(combined))
+        except Exception as e:
+            print(f"Combined enrichment failed, using separate calls: {e}")
+    missing = [field for field in todo if field not in fresh]
+    if mode == "combined" and missing:
+        print(f"Retrying {', '.join(missing)} for {data['source_url']}")
+    for field in missing:
+        value, cost = await with_cost(enrich_separately(data, field, subcategories, image_url))
+        valid = validate_enrichment({field: value}, [field], subcategories)
+        if field in valid:
+            fresh[field] = (valid[field], cost)
+            continue
+        # Never cached. A made-up subcategory files the model under "Other";
+        # bad tags or an empty description keep the scraped ones.
+        print(f"Invalid {field} for {data['source_url']}: {value!r}")
+        if field == "subcategory":
+            results["subcategory"] = "Other"
+    for field, (value, cost) in fresh.items():
+        cache.put(keys[field], field, value, cost)
+        results[field] = value
+
+    enriched = {**data}
+    if "description" in results:
+        enriched["description"] = results["description"]
+        print(enriched["description"])
+    if "subcategory" in results:
+        print(results["subcategory"])
+        enriched["subcategory"] = results["subcategory"]
+        enriched["category"] = subcategory_to_category.get(results["subcategory"], "Other")
+    if "tags" in results:
+        print(results["tags"])
+        enriched["tags"] = ",".join(results["tags"])
 
-    
-    new_description = make_description(data)
-    subcategory = define_subcategory(data, subcategories)
-    if(data['platform'] == "Thingiverse"):
-        safe_url = prepare_thingiverse_image(data['image_urls'][0][0])
-        print(safe_url)
-        tags = generate_tags(safe_url)
-    else:
-        tags = generate_tags(data['image_urls'][0][0])
-    print(new_description)
-    print(subcategory)
-    print(tags)
-
-    category = subcategory_to_category.get(subcategory, "Other")
-
-    enriched = {
-        **data,
-        "description" : new_description,
-        "category" : category,
-        "subcategory" : subcategory,
-        "tags" : ",".join(tags)
-    }
     return enriched
 
 # enrich_data({
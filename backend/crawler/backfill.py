@@ -0,0 +1,397 @@
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import time
+import openai
+from psycopg2.extras import execute_values
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from ai_enricher import (
+    ENRICHED_FIELDS, MODEL, combined_prompt, conn, cur, extract_json_from_response,
+    subcategory_to_category, validate_enrichment
+)
+from tag_image import image_part, pick_variant
+
+# Offline re-enrichment of the existing catalogue through the OpenAI Batch API
+# instead of one enrich_data round trip per model: candidate models are written
+# into JSONL request files, submitted as batches, polled until the results are
+# ready and applied to "Model" in bulk. Every step is recorded in a SQLite
+# state file, so an interrupted run picks up where it stopped and a 100k-model
+# backfill can be left running unattended.
+#
+#   python backfill.py prepare Thangs 50000 description,tags
+#   python backfill.py prepare-file models.jsonl
+#   python backfill.py prepare all --force     (a new pass over applied models)
+#   python backfill.py run
+#   python backfill.py status
+BACKFILL_DIR = os.getenv(
+    "BACKFILL_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "backfill")
+)
+BACKFILL_BACKEND = os.getenv("BACKFILL_BACKEND", "openai").lower()
+# The Batch API takes up to 50,000 requests and 200 MB per file.
+BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "10000"))
+# Batches in flight at once; the account's enqueued-token limit caps this.
+MAX_ACTIVE = int(os.getenv("BACKFILL_MAX_ACTIVE", "5"))
+POLL_SECONDS = int(os.getenv("BACKFILL_POLL", "60"))
+APPLY_PAGE = 1000
+
+ENDPOINT = "/v1/chat/completions"
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+# Batch statuses: written -> submitted -> downloaded -> applied.
+# Item statuses: queued -> applied | failed.
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS batches (
+        id TEXT PRIMARY KEY,
+        fields TEXT NOT NULL,
+        input_path TEXT NOT NULL,
+        requests INTEGER NOT NULL,
+        backend TEXT,
+        remote_id TEXT,
+        output_path TEXT,
+        status TEXT NOT NULL,
+        error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS items (
+        model_id TEXT PRIMARY KEY,
+        batch_id TEXT NOT NULL,
+        status TEXT NOT NULL,
+        error TEXT
+    );
+    CREATE INDEX IF NOT EXISTS items_batch ON items (batch_id, status);
+"""
+
+CANDIDATE_QUERY = """
+    SELECT m.id, m.title, m.description, m."sourceUrl", m."imagesUrl", m."thumbnailUrl", s.name
+    FROM "Model" m
+    LEFT JOIN "SourceSite" s ON m."sourceSiteId" = s.id
+    WHERE NOT m.deleted AND (%s::text IS NULL OR s.name = %s)
+    ORDER BY m."createdAt"
+"""
+
+def build_request(model_id, data, fields, subcategories):
+    # Stored images are our own public Backblaze copies, so the API can fetch
+    # them itself; nothing is inlined, which keeps request files small.
+    content = [{"type": "text", "text": combined_prompt(data, fields, subcategories)}]
+    if "tags" in fields and data.get("image_url"):
+        content.append(image_part(data["image_url"]))
+    return {
+        "custom_id": model_id,
+        "method": "POST",
+        "url": ENDPOINT,
+        "body": {
+            "model": MODEL,
+            "messages": [{"role": "user", "content": content}],
+            "response_format": {"type": "json_object"},
+            "temperature": 0.7
+        }
+    }
+
+def models_from_database(platform=None):
+    cur.execute(CANDIDATE_QUERY, (platform, platform))
+    for model_id, title, description, source_url, images_url, thumbnail_url, _ in cur.fetchall():
+        image_url = pick_variant(images_url) if images_url else thumbnail_url
+        yield model_id, {"title": title, "description": description, "source_url": source_url, "image_url": image_url}
+
+def models_from_file(path):
+    # One JSON object per line: id, title, description, source_url and
+    # optionally image_url.
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                yield record["id"], record
+
+class BackfillState:
+    def __init__(self, directory=BACKFILL_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, "state.db"), timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def pending_ids(self, fields, force=False):
+        # Models in flight are never prepared twice. Ones already applied are
+        # skipped only for the same fields, unless force starts a new pass,
+        # e.g. after a prompt change; failed ones are always retried.
+        rows = self.conn.execute(
+            """SELECT i.model_id FROM items i JOIN batches b ON i.batch_id = b.id
+               WHERE i.status = 'queued' OR (i.status = 'applied' AND b.fields = ? AND NOT ?)""",
+            (json.dumps(list(fields)), force)
+        )
+        return {row[0] for row in rows}
+
+    def add_batch(self, fields, requests):
+        count = self.conn.execute("SELECT COUNT(*) FROM batches").fetchone()[0]
+        batch_id = f"batch-{count + 1:05d}"
+        input_path = os.path.join(self.directory, f"{batch_id}.requests.jsonl")
+        with open(input_path, "w") as f:
+            for request in requests:
+                f.write(json.dumps(request, ensure_ascii=False) + "\n")
+        now = time.time()
+        self.conn.execute("BEGIN")
+        self.conn.execute(
+            "INSERT INTO batches (id, fields, input_path, requests, status, created_at, updated_at) VALUES (?, ?, ?, ?, 'written', ?, ?)",
+            (batch_id, json.dumps(fields), input_path, len(requests), now, now)
+        )
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO items (model_id, batch_id, status) VALUES (?, ?, 'queued')",
+            [(request["custom_id"], batch_id) for request in requests]
+        )
+        self.conn.execute("COMMIT")
+        return batch_id
+
+    def batches(self, *statuses):
+        marks = ", ".join("?" * len(statuses))
+        rows = self.conn.execute(
+            f"SELECT id, fields, input_path, backend, remote_id, output_path FROM batches WHERE status IN ({marks}) ORDER BY created_at",
+            statuses
+        ).fetchall()
+        return [
+            {"id": row[0], "fields": json.loads(row[1]), "input_path": row[2], "backend": row[3], "remote_id": row[4], "output_path": row[5]}
+            for row in rows
+        ]
+
+    def update_batch(self, batch_id, **columns):
+        columns["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        self.conn.execute(f"UPDATE batches SET {assignments} WHERE id = ?", (*columns.values(), batch_id))
+
+    def finish_items(self, applied, failed):
+        self.conn.execute("BEGIN")
+        self.conn.executemany("UPDATE items SET status = 'applied', error = NULL WHERE model_id = ?", [(model_id,) for model_id in applied])
+        self.conn.executemany("UPDATE items SET status = 'failed', error = ? WHERE model_id = ?", [(error, model_id) for model_id, error in failed])
+        self.conn.execute("COMMIT")
+
+    def fail_unanswered(self, batch_id, error):
+        self.conn.execute("UPDATE items SET status = 'failed', error = ? WHERE batch_id = ? AND status = 'queued'", (error, batch_id))
+
+    def counts(self):
+        batches = self.conn.execute("SELECT status, COUNT(*) FROM batches GROUP BY status").fetchall()
+        items = self.conn.execute("SELECT status, COUNT(*) FROM items GROUP BY status").fetchall()
+        return batches, items
+
+    def close(self):
+        self.conn.close()
+
+class OpenAIBatches:
+    def __init__(self):
+        self.client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    async def submit(self, input_path):
+        with open(input_path, "rb") as f:
+            uploaded = await self.client.files.create(file=f, purpose="batch")
+        batch = await self.client.batches.create(input_file_id=uploaded.id, endpoint=ENDPOINT, completion_window="24h")
+        return batch.id
+
+    async def poll(self, remote_id):
+        # (status, result file ids); failed requests go to the error file.
+        batch = await self.client.batches.retrieve(remote_id)
+        return batch.status, [file_id for file_id in (batch.output_file_id, batch.error_file_id) if file_id]
+
+    async def download(self, file_ids, output_path):
+        with open(output_path, "wb") as f:
+            for file_id in file_ids:
+                content = await self.client.files.content(file_id)
+                f.write(content.content)
+
+def canned_response(body):
+    subcategory = next(iter(subcategory_to_category), None)
+    return {"description": "Backfill test description", "subcategory": subcategory, "tags": ["backfill", "test"]}
+
+class LocalBatches:
+    # Stand-in for tests and dry runs: completes a batch as soon as it is
+    # polled, answering every request with responder(body) in the same
+    # output format as the Batch API.
+    def __init__(self, responder=canned_response):
+        self.responder = responder
+
+    async def submit(self, input_path):
+        return f"local:{input_path}"
+
+    async def poll(self, remote_id):
+        return "completed", [remote_id[len("local:"):]]
+
+    async def download(self, file_ids, output_path):
+        with open(file_ids[0]) as source, open(output_path, "w") as out:
+            for line in source:
+                request = json.loads(line)
+                content = json.dumps(self.responder(request["body"]))
+                response = {"status_code": 200, "body": {"choices": [{"message": {"role": "assistant", "content": content}}]}}
+                out.write(json.dumps({"custom_id": request["custom_id"], "response": response, "error": None}) + "\n")
+
+BACKENDS = {"openai": OpenAIBatches, "local": LocalBatches}
+
+def prepare(state, models, fields=ENRICHED_FIELDS, limit=None, force=False):
+    fields = [field for field in ENRICHED_FIELDS if field in fields]
+    subcategories = list(subcategory_to_category.keys())
+    skip = state.pending_ids(fields, force)
+    requests = []
+    batches = []
+    prepared = 0
+    for model_id, data in models:
+        if limit and prepared >= limit:
+            break
+        if model_id in skip:
+            continue
+        requests.append(build_request(model_id, data, fields, subcategories))
+        skip.add(model_id)
+        prepared += 1
+        if len(requests) == BATCH_SIZE:
+            batches.append(state.add_batch(fields, requests))
+            requests = []
+    if requests:
+        batches.append(state.add_batch(fields, requests))
+    print(f"[backfill] wrote {prepared} requests in {len(batches)} batch files")
+    return batches
+
+def parse_result(line, fields, subcategories):
+    # (model_id, valid fields or None, error)
+    result = json.loads(line)
+    model_id = result["custom_id"]
+    response = result.get("response") or {}
+    if result.get("error") or response.get("status_code") != 200:
+        return model_id, None, json.dumps(result.get("error") or response.get("body"))[:500]
+    raw = response["body"]["choices"][0]["message"]["content"]
+    try:
+        parsed = json.loads(extract_json_from_response(raw) or raw)
+    except (TypeError, ValueError):
+        return model_id, None, "invalid JSON"
+    valid = validate_enrichment(parsed, fields, subcategories) if isinstance(parsed, dict) else {}
+    if not valid:
+        return model_id, None, "no valid fields"
+    return model_id, valid, None
+
+def category_ids():
+    cur.execute("""
+        SELECT s.name, c.id, s.id
+        FROM "SubCategory" s
+        JOIN "Category" c ON s."categoryId" = c.id
+    """)
+    return {name: (category_id, subcategory_id) for name, category_id, subcategory_id in cur.fetchall()}
+
+def update_models(rows):
+    # Columns left NULL in a row keep their current value.
+    execute_values(cur, """
+        UPDATE "Model" AS m SET
+            description = COALESCE(v.description, m.description),
+            "categoryId" = COALESCE(v.category_id, m."categoryId"),
+            "subCategoryId" = COALESCE(v.subcategory_id, m."subCategoryId"),
+            tags = COALESCE(v.tags, m.tags),
+            "updatedAt" = now()
+        FROM (VALUES %s) AS v(id, description, category_id, subcategory_id, tags)
+        WHERE m.id = v.id
+    """, rows, template="(%s, %s, %s, %s, %s::text[])", page_size=APPLY_PAGE)
+    conn.commit()
+
+def apply_batch(state, batch, ids):
+    subcategories = list(subcategory_to_category.keys())
+    rows, applied, failed = [], [], []
+
+    def flush():
+        if not rows and not failed:
+            return
+        try:
+            if rows:
+                update_models(rows)
+        except Exception as e:
+            conn.rollback()
+            raise RuntimeError(f"Bulk update of {batch['id']} failed: {e}")
+        state.finish_items(applied, failed)
+        rows.clear()
+        applied.clear()
+        failed.clear()
+
+    with open(batch["output_path"]) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            model_id, valid, error = parse_result(line, batch["fields"], subcategories)
+            if valid is None:
+                failed.append((model_id, error))
+                continue
+            category_id, subcategory_id = ids.get(valid.get("subcategory"), (None, None))
+            rows.append((model_id, valid.get("description"), category_id, subcategory_id, valid.get("tags")))
+            applied.append(model_id)
+            if len(rows) >= APPLY_PAGE:
+                flush()
+    flush()
+    state.fail_unanswered(batch["id"], "no result in batch output")
+    state.update_batch(batch["id"], status="applied")
+
+async def submit_written(state, backend_name):
+    active = len(state.batches("submitted"))
+    for batch in state.batches("written")[:max(0, MAX_ACTIVE - active)]:
+        try:
+            remote_id = await BACKENDS[backend_name]().submit(batch["input_path"])
+        except Exception as e:
+            print(f"[backfill] could not submit {batch['id']}: {e}")
+            continue
+        state.update_batch(batch["id"], status="submitted", backend=backend_name, remote_id=remote_id)
+        print(f"[backfill] submitted {batch['id']} as {remote_id}")
+
+async def collect(state, batch):
+    backend = BACKENDS[batch["backend"]]()
+    status, file_ids = await backend.poll(batch["remote_id"])
+    if status not in TERMINAL:
+        return
+    output_path = os.path.join(state.directory, f"{batch['id']}.results.jsonl")
+    # Expired and cancelled batches still return what was finished; the
+    # rest of their items fail and are picked up by the next prepare.
+    await backend.download(file_ids, output_path)
+    state.update_batch(batch["id"], status="downloaded", output_path=output_path, error=None if status == "completed" else status)
+    print(f"[backfill] {batch['id']} {status}")
+
+async def run(backend_name=BACKFILL_BACKEND):
+    # Submits, polls and applies until every batch is applied. Safe to stop
+    # and start again at any point.
+    state = BackfillState()
+    ids = category_ids()
+    try:
+        while True:
+            await submit_written(state, backend_name)
+            submitted = state.batches("submitted")
+            results = await asyncio.gather(*(collect(state, batch) for batch in submitted), return_exceptions=True)
+            for batch, result in zip(submitted, results):
+                if isinstance(result, Exception):
+                    print(f"[backfill] polling {batch['id']} failed: {result}")
+            for batch in state.batches("downloaded"):
+                apply_batch(state, batch, ids)
+                print(f"[backfill] applied {batch['id']}")
+            if not state.batches("written", "submitted", "downloaded"):
+                break
+            await asyncio.sleep(POLL_SECONDS)
+        report(state)
+    finally:
+        state.close()
+
+def report(state):
+    batches, items = state.counts()
+    print("[backfill] batches: " + ", ".join(f"{status} {count}" for status, count in batches))
+    print("[backfill] models: " + ", ".join(f"{status} {count}" for status, count in items))
+
+def parse_fields(arg):
+    fields = [field.strip() for field in arg.split(",")] if arg else ENRICHED_FIELDS
+    unknown = set(fields) - set(ENRICHED_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+if __name__ == "__main__":
+    force = "--force" in sys.argv
+    args = [arg for arg in sys.argv if arg != "--force"]
+    command = args[1] if len(args) > 1 else "status"
+    if command == "prepare":
+        platform = args[2] if len(args) > 2 and args[2] != "all" else None
+        limit = int(args[3]) if len(args) > 3 else None
+        prepare(BackfillState(), models_from_database(platform), parse_fields(args[4] if len(args) > 4 else None), limit, force)
+    elif command == "prepare-file":
+        prepare(BackfillState(), models_from_file(args[2]), parse_fields(args[3] if len(args) > 3 else None), force=force)
+    elif command == "run":
+        asyncio.run(run(args[2] if len(args) > 2 else BACKFILL_BACKEND))
+    else:
+        report(BackfillState())
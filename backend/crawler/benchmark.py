@@ -0,0 +1,172 @@
+import functools
+import hashlib
+import http.server
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import browser_pool
+import snapshot_store
+from browser_pool import run_pooled
+from replay import PARSERS, load_parser
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Times the six get_info parsers against saved pages served from a local HTTP
+# server, with the proxy disabled and every other host blocked, so runs are
+# repeatable and need no network:
+#
+#   python benchmark.py export all 20            (fixtures from the snapshot store)
+#   python benchmark.py run all 10 results.json  (10 passes over every fixture)
+FIXTURES_DIR = os.getenv(
+    "BENCHMARK_FIXTURES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_fixtures")
+)
+
+def export_fixtures(platform, count=None):
+    # Copies snapshotted detail pages into the fixture tree, scripts removed
+    # the same way replay serves them.
+    store = snapshot_store.get_store()
+    directory = os.path.join(FIXTURES_DIR, platform)
+    os.makedirs(directory, exist_ok=True)
+    index_path = os.path.join(directory, "index.json")
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+    for manifest in list(store.iter_manifests(platform))[:count]:
+        name = hashlib.sha256(manifest["url"].encode("utf-8")).hexdigest()[:12] + ".html"
+        with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+            f.write(snapshot_store.EXECUTABLE_SCRIPT.sub("", store.html(manifest)))
+        index[name] = manifest["url"]
+    with open(index_path, "w") as f:
+        json.dump(index, f, indent=2)
+    print(f"[{platform}] {len(index)} fixtures in {directory}")
+
+def fixture_names(platform):
+    directory = os.path.join(FIXTURES_DIR, platform)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name for name in os.listdir(directory) if name.endswith(".html"))
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+def start_fixture_server():
+    handler = functools.partial(_QuietHandler, directory=FIXTURES_DIR)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def browser_rss():
+    # Resident memory of this process and its Chromium children, when psutil
+    # is installed.
+    if psutil is None:
+        return None
+    process = psutil.Process()
+    total = process.memory_info().rss
+    for child in process.children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+def percentile(values, q):
+    # None when nothing was timed, e.g. a run with zero iterations.
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+async def bench_platform(platform, base_url, iterations):
+    names = fixture_names(platform)
+    if not names:
+        print(f"[{platform}] no fixtures, skipping")
+        return None
+    get_info = load_parser(platform)
+    # One warm-up pass so browser start-up is not counted.
+    await get_info(f"{base_url}/{platform}/{names[0]}")
+
+    latencies = []
+    failures = 0
+    peak_rss = browser_rss()
+    tracemalloc.start()
+    started = time.monotonic()
+    for _ in range(iterations):
+        for name in names:
+            page_started = time.monotonic()
+            try:
+                info = await get_info(f"{base_url}/{platform}/{name}")
+                if not info or isinstance(info, str):
+                    failures += 1
+            except Exception as e:
+                print(f"[{platform}] {name} failed: {e}")
+                failures += 1
+            latencies.append((time.monotonic() - page_started) * 1000)
+            rss = browser_rss()
+            if rss is not None:
+                peak_rss = max(peak_rss, rss)
+    elapsed = time.monotonic() - started
+    p50, p95 = percentile(latencies, 50), percentile(latencies, 95)
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "platform": platform,
+        "pages": len(latencies),
+        "failures": failures,
+        "p50_ms": round(p50, 1) if p50 is not None else None,
+        "p95_ms": round(p95, 1) if p95 is not None else None,
+        "pages_per_s": round(len(latencies) / elapsed, 2),
+        "python_peak_mb": round(python_peak / 2**20, 1),
+        "rss_peak_mb": round(peak_rss / 2**20, 1) if peak_rss is not None else None
+    }
+    print(f"[{platform}] {result['pages']} pages, {failures} failed, p50 {result['p50_ms']}ms, "
+          f"p95 {result['p95_ms']}ms, {result['pages_per_s']} pages/s, python peak {result['python_peak_mb']}MB, "
+          f"rss peak {result['rss_peak_mb'] if result['rss_peak_mb'] is not None else 'n/a (install psutil)'}MB")
+    return result
+
+async def run_benchmark(platforms, iterations, out_path=None):
+    browser_pool.PROXY_ENABLED = False
+    browser_pool.HEADLESS = True
+    browser_pool.ALLOWED_HOSTS = {"127.0.0.1"}
+    # CRAWL_SNAPSHOTS=record would save the fixture pages into the snapshot
+    # store, and replay would serve the store instead of the fixtures.
+    snapshot_store.set_mode("off")
+    server = start_fixture_server()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        results = []
+        for platform in platforms:
+            result = await bench_platform(platform, base_url, iterations)
+            if result is not None:
+                results.append(result)
+    finally:
+        server.shutdown()
+    if out_path:
+        with open(out_path, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "run"
+    platform = sys.argv[2] if len(sys.argv) > 2 else "all"
+    platforms = list(PARSERS) if platform == "all" else [platform]
+    if command == "export":
+        count = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        for name in platforms:
+            export_fixtures(name, count)
+    else:
+        iterations = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+        out_path = sys.argv[4] if len(sys.argv) > 4 else None
+        run_pooled(run_benchmark(platforms, iterations, out_path))
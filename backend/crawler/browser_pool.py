@@ -0,0 +1,226 @@
+from playwright.async_api import async_playwright
+from contextlib import asynccontextmanager
+import asyncio
+import os
+from urllib.parse import urlsplit
+from resource_blocker import apply_blocking, report_blocking
+from page_ready import report_readiness
+from snapshot_store import attach_snapshots, replaying
+from rate_limiter import limiter, rate_limited_navigation
+from proxy_pool import ProxyPool, ProxyProbe, configured_proxies
+
+user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
+
+# Number of Chromium processes kept alive per proxy, how many contexts each
+# of them serves at once, and how many pages a context renders before it is
+# thrown away and rebuilt.
+POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "2"))
+CONTEXTS_PER_BROWSER = int(os.getenv("BROWSER_CONTEXTS_PER_BROWSER", "2"))
+PAGES_PER_CONTEXT = int(os.getenv("BROWSER_PAGES_PER_CONTEXT", "25"))
+HEADLESS = os.getenv("BROWSER_HEADLESS", "false").lower() == "true"
+# BROWSER_PROXY=off ignores the proxies the scrapers ask for, and
+# BROWSER_ALLOWED_HOSTS (comma separated) aborts requests to any other host;
+# together they keep local runs such as the benchmark off the network.
+PROXY_ENABLED = os.getenv("BROWSER_PROXY", "on").lower() != "off"
+ALLOWED_HOSTS = {host for host in os.getenv("BROWSER_ALLOWED_HOSTS", "").split(",") if host}
+
+INFATICA_PROXY = {
+    "server": "http://pool.infatica.io:10000",
+    "username": "C0aeX1JZjKzfxgTQDpbG",
+    "password": "yl9xbHM8"
+}
+
+async def _allowed_hosts_only(route):
+    if urlsplit(route.request.url).hostname in ALLOWED_HOSTS:
+        await route.fallback()
+    else:
+        await route.abort()
+
+class _Slot:
+    def __init__(self, browser_index):
+        self.browser_index = browser_index
+        self.context = None
+        self.proxy_health = None
+        self.pages_served = 0
+
+class BrowserPool:
+    def __init__(self, proxies=None, size=POOL_SIZE, contexts_per_browser=CONTEXTS_PER_BROWSER, pages_per_context=PAGES_PER_CONTEXT):
+        # proxies: a ProxyPool; each new context goes through its healthiest proxy.
+        self.proxies = proxies
+        self.size = size
+        self.contexts_per_browser = contexts_per_browser
+        self.pages_per_context = pages_per_context
+        self._playwright = None
+        self._browsers = [None] * size
+        self._browser_locks = [asyncio.Lock() for _ in range(size)]
+        self._slots = asyncio.Queue()
+        self._all_slots = []
+        self._start_lock = asyncio.Lock()
+        self.recycled = 0
+
+    async def start(self):
+        async with self._start_lock:
+            if self._playwright is not None:
+                return
+            self._playwright = await async_playwright().start()
+            for i in range(self.size):
+                for _ in range(self.contexts_per_browser):
+                    slot = _Slot(i)
+                    self._all_slots.append(slot)
+                    self._slots.put_nowait(slot)
+
+    async def _browser(self, index):
+        async with self._browser_locks[index]:
+            browser = self._browsers[index]
+            if browser is None or not browser.is_connected():
+                browser = await self._playwright.chromium.launch(headless=HEADLESS)
+                self._browsers[index] = browser
+            return browser
+
+    async def _context(self, slot):
+        if slot.context is None:
+            browser = await self._browser(slot.browser_index)
+            context_args = {}
+            if self.proxies:
+                slot.proxy_health = self.proxies.choose()
+                context_args["proxy"] = slot.proxy_health.proxy
+            slot.context = await browser.new_context(
+                user_agent=user_agent,
+                viewport={"width": 1280, "height": 800},
+                locale="en-US",
+                **context_args
+            )
+            slot.pages_served = 0
+        return slot.context
+
+    async def _recycle(self, slot):
+        if slot.context is not None:
+            try:
+                await slot.context.close()
+            except Exception:
+                pass
+            self.recycled += 1
+        slot.context = None
+        slot.proxy_health = None
+
+    @asynccontextmanager
+    async def page(self, platform=None):
+        await self.start()
+        slot = await self._slots.get()
+        page = None
+        blocking = None
+        snapshot = None
+        crashed = False
+        crash_events = []
+        try:
+            context = await self._context(slot)
+            page = await context.new_page()
+            page.on("crash", lambda p: crash_events.append(p))
+            if slot.proxy_health is not None:
+                ProxyProbe(slot.proxy_health, page).install()
+            if not replaying():
+                blocking = await apply_blocking(page, platform)
+            snapshot = await attach_snapshots(page, platform)
+            if ALLOWED_HOSTS:
+                await page.route("**/*", _allowed_hosts_only)
+            if not replaying():
+                await page.route("**/*", rate_limited_navigation)
+            yield page
+        except Exception:
+            crashed = True
+            raise
+        finally:
+            if crash_events:
+                print("Page crashed, recycling its context")
+                crashed = True
+            # The slot always goes back, even if bookkeeping below fails or
+            # the borrower is cancelled, or the pool would shrink for good.
+            try:
+                await self._release(slot, page, blocking, snapshot, crashed)
+            except Exception as e:
+                print(f"Could not release page, recycling its context: {e}")
+                await self._recycle(slot)
+            finally:
+                self._slots.put_nowait(slot)
+
+    async def _release(self, slot, page, blocking, snapshot, crashed):
+        slot.pages_served += 1
+        for session in (snapshot, blocking):
+            if session is None or (session is blocking and page.is_closed()):
+                continue
+            try:
+                await session.finish()
+            except Exception as e:
+                print(f"Could not finish {type(session).__name__}: {e}")
+        if page is not None:
+            if page.is_closed():
+                crashed = True
+            else:
+                try:
+                    await page.close()
+                except Exception:
+                    crashed = True
+        browser = self._browsers[slot.browser_index]
+        if browser is None or not browser.is_connected():
+            crashed = True
+        # A context whose proxy was benched moves to a healthy one.
+        if slot.proxy_health is not None and not self.proxies.available(slot.proxy_health):
+            crashed = True
+        if crashed or slot.pages_served >= self.pages_per_context:
+            await self._recycle(slot)
+
+    async def close(self):
+        for slot in self._all_slots:
+            await self._recycle(slot)
+        for browser in self._browsers:
+            if browser is not None:
+                try:
+                    await browser.close()
+                except Exception:
+                    pass
+        self._browsers = [None] * self.size
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+        if self.proxies:
+            self.proxies.report()
+
+# One direct pool and one proxied pool, bound to the event loop that created
+# them. Every scraper asking for a proxy shares the proxied pool, which
+# rotates over CRAWL_PROXIES (or just the requested proxy if unset).
+_pools = {}
+_pools_loop = None
+
+def get_pool(proxy=None):
+    global _pools, _pools_loop
+    loop = asyncio.get_running_loop()
+    if not PROXY_ENABLED:
+        proxy = None
+    if loop is not _pools_loop:
+        _pools = {}
+        _pools_loop = loop
+    key = "proxied" if proxy else None
+    if key not in _pools:
+        _pools[key] = BrowserPool(proxies=ProxyPool(configured_proxies(proxy)) if proxy else None)
+    return _pools[key]
+
+def borrow_page(proxy=None, platform=None):
+    return get_pool(proxy).page(platform=platform)
+
+async def close_pools():
+    global _pools
+    pools = list(_pools.values())
+    _pools = {}
+    for pool in pools:
+        await pool.close()
+    report_blocking()
+    report_readiness()
+    limiter.log()
+
+def run_pooled(main):
+    async def runner():
+        try:
+            return await main
+        finally:
+            await close_pools()
+    return asyncio.run(runner())
@@ -1,50 +1,38 @@
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
-import asyncio
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from get_cgt import get_info
 import os
 import sys
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 sys.path.append(project_root)
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from ai_enricher import enrich_data
-from src.utils.injection import url_exists_in_db, inject_database
-
-user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
+from browser_pool import borrow_page, run_pooled, INFATICA_PROXY
+from rate_limiter import limited_goto
+from pipeline import PlatformAdapter, from_list, run_pipeline, run_recrawl
+from src.utils.injection import known_urls
 
 async def scrape_cgtrader(category, number):
     found_urls = 0
     collected_urls = []
     for i in range(250):        
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=False,
-                proxy={
-                    "server": "http://pool.infatica.io:10000",
-                    "username": "C0aeX1JZjKzfxgTQDpbG",
-                    "password": "yl9xbHM8"
-                }
-            
-            )  # Set headless=True if you don't want the browser to show
-            page = await browser.new_page(
-                user_agent=user_agent, 
-                viewport={"width": 1280, "height": 800},
-                locale="en-US"
-            )
+        # Listing pages go through the proxied pool, so they rotate over
+        # CRAWL_PROXIES and report to its health scores like detail pages.
+        async with borrow_page(proxy=INFATICA_PROXY) as page:
             # await page.goto(f"https://ipinfo.io/what-is-my-ip", timeout=60000, wait_until="domcontentloaded")
             try:
-                await page.goto(f"https://www.cgtrader.com/3d-models/{category}?page={i+1}", timeout=60000, wait_until="domcontentloaded")
+                await limited_goto(page, f"https://www.cgtrader.com/3d-models/{category}?page={i+1}", timeout=60000, wait_until="domcontentloaded")
 
                 await page.wait_for_selector('div.card-3d-model')
-                anchors = await page.locator("div.card-3d-model a.cgt-model-card__link").all()
-                for a in anchors:
-                    href = await a.get_attribute("href")
-                    if href and not url_exists_in_db(href) and href not in collected_urls:
+                hrefs = await page.eval_on_selector_all(
+                    "div.card-3d-model a.cgt-model-card__link",
+                    "els => els.map(a => a.getAttribute('href'))"
+                )
+                for href in known_urls.filter_new("CGTrader", hrefs):
+                    if href not in collected_urls:
                         collected_urls.append(href)
                         found_urls += 1
 
                         if len(collected_urls) >= number:
                             print(f"Reached target count: {number}")
-                            await browser.close()
                             return collected_urls
                 
                 if i+1 == 250:
@@ -55,30 +43,21 @@ async def scrape_cgtrader(category, number):
                 print(f"Attempt failed to load: ")
                 continue
                     
-            await browser.close()
             return collected_urls
 
-async def pass_AI(results): 
-    for url in results:
-        merged_info = {}
-        info = await get_info(url)
-        if not info:
-            continue
+async def pass_AI(results, concurrency=None):
+    adapter = PlatformAdapter("CGTrader", from_list(results), get_info)
+    return await run_pipeline(adapter, fetch_workers=concurrency, limit=len(results))
+
+async def crawl_cgtrader(category, number, concurrency=None):
+    results = await scrape_cgtrader(category, number)
+    return await pass_AI(results, concurrency)
 
-        for item in info:
-            if isinstance(item, dict):
-                merged_info.update(item)
-        merged_info["source_url"] = url
-        merged_info["platform"] = "CGTrader"
-        res = enrich_data(merged_info)
-        if res == None:
-            continue
-        else:
-            await inject_database(res)
+async def recrawl_cgtrader(num, concurrency=None):
+    return await run_recrawl("CGTrader", get_info, num, fetch_workers=concurrency)
 
 if __name__ == "__main__":
     # category = sys.argv[1]
     # number = int(sys.argv[2])
-    # results = asyncio.run(scrape_cgtrader(category, number))
-    results = asyncio.run(scrape_cgtrader("aircraft", 1))
-    asyncio.run(pass_AI(results))
\ No newline at end of file
+    # run_pooled(crawl_cgtrader(category, number))
+    run_pooled(crawl_cgtrader("aircraft", 1))
\ No newline at end of file
@@ -1,75 +1,78 @@
-from playwright.async_api import async_playwright
-import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from browser_pool import borrow_page, run_pooled
+from extract_schema import validate
+from page_ready import wait_ready
+from typing import List, Optional, TypedDict
 
-async def get_info(url):
-    user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
-
-    info = []
+class CGTraderPage(TypedDict):
+    title: str
+    description: str
+    tags: List[str]
+    price: str
+    image_urls: List[List[Optional[str]]]
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)  # Set to True to hide the browser
-        page = await browser.new_page(user_agent=user_agent, 
-            viewport={"width": 1280, "height": 800},
-            locale="en-US"
-        )
+EXTRACT_JS = """
+    () => {
+        const tags = [];
+        for (const label of document.querySelectorAll('.tags-list .labels-list .label')) {
+            let text = label.childNodes[0]?.textContent.trim();
+            if (!text) {
+                text = label.querySelector('a:not(.js-remove-tag)')?.textContent.trim();
+            }
+            if (text) tags.push(text);
+        }
 
-        try:
-            await page.goto(url, timeout=60000, wait_until="domcontentloaded")
+        let description = null;
+        const container = document.querySelector('.product-description');
+        if (container) {
+            const copy = container.cloneNode(true);
+            copy.querySelector('.tags-list')?.remove();
+            description = copy.textContent.trim().replace('Description', '').trim();
+        }
 
-            await page.wait_for_selector('span[itemprop="item"] span[itemprop="name"]')
-            title = await page.locator('span[itemprop="item"] span[itemprop="name"]').inner_text()
-            if await page.locator(".product-description").count() > 0:
-                await page.wait_for_selector('.product-description', state="attached")
+        return {
+            title: document.querySelector('span[itemprop="item"] span[itemprop="name"]').innerText,
+            description: description,
+            tags: tags,
+            price: document.querySelector('#product-price-final')?.textContent ?? null,
+            image_urls: [...document.querySelectorAll('.thumb-list-wrapper img')]
+                .map(img => [img.getAttribute('data-src'), img.getAttribute('data-thumb-src')])
+                .filter(([main]) => main && main.startsWith('https://img-new.cgtrader.com/items/'))
+        };
+    }
+"""
 
-                tags = []
-                tag_els = await page.query_selector_all('.tags-list .labels-list .label')
-                for el in tag_els:
-                    text = await el.evaluate('(el) => el.childNodes[0]?.textContent.trim()')
-                    if not text:
-                        a = await el.query_selector('a:not(.js-remove-tag)')
-                        if a:
-                            text = await a.text_content()
-                            text = text.strip()
-                            if text:
-                                tags.append(text)
-                    else:
-                        tags.append(text)
-                
-                await page.eval_on_selector('.product-description .tags-list', 'el => el.remove()')
-                description_text = await page.text_content('.product-description')
-                full_description = description_text.strip()
-                description = full_description.replace("Description", "", 1).strip()
+async def get_info(url):
+    info = []
 
-            elements = await page.query_selector_all('#product-price-final')
-            first_el = elements[0]
-            price = await first_el.text_content()
+    async with borrow_page(platform="CGTrader") as page:
+        try:
+            response = await page.goto(url, timeout=60000, wait_until="domcontentloaded")
 
-            image_urls = []
-            thumb_els = await page.query_selector_all('.thumb-list-wrapper img')
-            for el in thumb_els:
-                main_src = await el.get_attribute('data-src')
-                thumb_src = await el.get_attribute('data-thumb-src')
-                if main_src and main_src.startswith("https://img-new.cgtrader.com/items/"):
-                    image_urls.append([main_src, thumb_src])
+            ready = await wait_ready(page, ['span[itemprop="item"] span[itemprop="name"]'], response=response, platform="CGTrader")
+            if not ready.ok:
+                return None
+            data = validate(await page.evaluate(EXTRACT_JS), CGTraderPage)
 
+            image_urls = data["image_urls"]
             thumbnail_url = image_urls[0][0]
 
-            info.append({"title" : title})
-            info.append({"description" : description})
-            info.append({"tags" : tags})
+            info.append({"title" : data["title"]})
+            info.append({"description" : data["description"]})
+            info.append({"tags" : data["tags"]})
             info.append({"image_urls" : image_urls})
             info.append({"thumbnail_url": thumbnail_url})
-            info.append({"price" : price})
+            info.append({"price" : data["price"]})
             return(info)
 
         except Exception as e:
             print(f"Error loading page: {e}")
             return None
-        finally:
-            await browser.close()
 
 if __name__ == "__main__":
     url = 'https://www.cgtrader.com/3d-models/aircraft/aircraft-part/engine-jet-pack'
-    result = asyncio.run(get_info(url))
+    result = run_pooled(get_info(url))
 
     print(result)
\ No newline at end of file
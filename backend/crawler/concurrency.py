@@ -0,0 +1,17 @@
+import os
+
+# How many detail pages each platform fetches at once (the pipeline's fetch
+# stage workers). Override with CRAWL_CONCURRENCY_<PLATFORM>, e.g.
+# CRAWL_CONCURRENCY_THANGS=5. A limit of 1 gives the old one-by-one behaviour.
+PLATFORM_CONCURRENCY = {
+    "Thingiverse": 4,
+    "Printables": 3,
+    "Thangs": 3,
+    "CGTrader": 3,
+    "Makerworld": 3,
+    "Pinshape": 3
+}
+
+def concurrency_for(platform):
+    default = PLATFORM_CONCURRENCY.get(platform, 1)
+    return max(1, int(os.getenv(f"CRAWL_CONCURRENCY_{platform.upper()}", default)))
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+
+# Enrichment outputs already paid for, keyed by the normalized prompt inputs,
+# the model and the taxonomy version, so a re-scrape or a retry after a failed
+# upload costs no LLM call. Descriptions are keyed by the source URL and tags
+# by the source image, so only subcategories can hit for the same item on
+# another platform. Entries expire after the TTL and the least recently used
+# ones are evicted once the file passes its size bound.
+CACHE_PATH = os.getenv(
+    "ENRICH_CACHE",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "enrichment_cache.db")
+)
+CACHE_TTL = int(os.getenv("ENRICH_CACHE_TTL", str(30 * 24 * 3600)))
+CACHE_MAX_BYTES = int(float(os.getenv("ENRICH_CACHE_MAX_MB", "200")) * 2**20)
+# Size is checked every this many writes.
+EVICT_EVERY = 100
+
+# gpt-4o list prices, dollars per million tokens, for the savings report.
+PRICE_INPUT_PER_1M = float(os.getenv("LLM_PRICE_INPUT_PER_1M", "2.5"))
+PRICE_OUTPUT_PER_1M = float(os.getenv("LLM_PRICE_OUTPUT_PER_1M", "10"))
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS enrichment (
+        key TEXT PRIMARY KEY,
+        field TEXT NOT NULL,
+        value TEXT NOT NULL,
+        cost REAL NOT NULL DEFAULT 0,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        used_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS enrichment_used_at ON enrichment (used_at);
+"""
+
+def usage_cost(prompt_tokens, completion_tokens):
+    return (prompt_tokens * PRICE_INPUT_PER_1M + completion_tokens * PRICE_OUTPUT_PER_1M) / 1e6
+
+def normalize(value):
+    if isinstance(value, str):
+        return re.sub(r"\s+", " ", value).strip()
+    if isinstance(value, (list, tuple)):
+        return [normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {key: normalize(item) for key, item in sorted(value.items())}
+    return value
+
+def taxonomy_version(subcategory_to_category):
+    return hashlib.sha256(json.dumps(sorted(subcategory_to_category.items())).encode("utf-8")).hexdigest()[:12]
+
+class EnrichmentCache:
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.saved = 0.0
+        self.writes = 0
+
+    def key(self, field, model, inputs):
+        payload = json.dumps([field, model, normalize(inputs)], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        row = self.conn.execute(
+            "SELECT value, cost FROM enrichment WHERE key = ? AND created_at > ?", (key, now - self.ttl)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.conn.execute("UPDATE enrichment SET used_at = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        self.saved += row[1]
+        return json.loads(row[0])
+
+    def put(self, key, field, value, cost=0.0):
+        now = time.time()
+        encoded = json.dumps(value, ensure_ascii=False)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO enrichment (key, field, value, cost, size, created_at, used_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (key, field, encoded, cost, len(encoded) + len(key), now, now)
+        )
+        self.writes += 1
+        if self.writes % EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        self.conn.execute("DELETE FROM enrichment WHERE created_at <= ?", (time.time() - self.ttl,))
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM enrichment").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Oldest-used first until a tenth below the bound, so eviction does
+        # not run again on the very next check.
+        target = total - self.max_bytes * 0.9
+        freed = 0
+        keys = []
+        for key, size in self.conn.execute("SELECT key, size FROM enrichment ORDER BY used_at").fetchall():
+            keys.append((key,))
+            freed += size
+            if freed >= target:
+                break
+        self.conn.executemany("DELETE FROM enrichment WHERE key = ?", keys)
+        print(f"[enrich cache] evicted {len(keys)} entries")
+
+    def report(self):
+        lookups = self.hits + self.misses
+        if not lookups:
+            return
+        print(f"[enrich cache] {self.hits}/{lookups} hits ({self.hits / lookups:.0%}), saved ~${self.saved:.2f}")
+
+    def close(self):
+        self.conn.close()
+
+_cache = None
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = EnrichmentCache()
+    return _cache
+
+def report_cache():
+    if _cache is not None:
+        _cache.report()
@@ -0,0 +1,38 @@
+from typing import Any, Union, get_args, get_origin, get_type_hints
+
+# Each get_info pulls everything it needs out of the page with a single
+# page.evaluate() and describes the returned object as a TypedDict. validate()
+# checks that object against it so markup changes fail loudly at extraction
+# instead of as a KeyError somewhere in enrichment.
+
+class ExtractionError(ValueError):
+    pass
+
+def _matches(value, hint):
+    if hint is Any:
+        return True
+    if hint is type(None):
+        return value is None
+    origin = get_origin(hint)
+    if origin is Union:
+        return any(_matches(value, arg) for arg in get_args(hint))
+    if origin is list:
+        (item_hint,) = get_args(hint) or (Any,)
+        return isinstance(value, list) and all(_matches(item, item_hint) for item in value)
+    if hint is float:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+    if hint is int:
+        return isinstance(value, int) and not isinstance(value, bool)
+    return isinstance(value, hint)
+
+def validate(data, schema):
+    if not isinstance(data, dict):
+        raise ExtractionError(f"{schema.__name__}: expected an object, got {type(data).__name__}")
+    for key, hint in get_type_hints(schema).items():
+        if key not in data:
+            if key in schema.__required_keys__:
+                raise ExtractionError(f"{schema.__name__}: missing '{key}'")
+            continue
+        if not _matches(data[key], hint):
+            raise ExtractionError(f"{schema.__name__}: '{key}' should be {hint}, got {data[key]!r}")
+    return data
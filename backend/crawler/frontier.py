@@ -0,0 +1,132 @@
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+
+# Every discovered URL is written here with its progress, so a crash or Ctrl-C
+# does not lose discovery work and the next run picks up where this one
+# stopped. A URL is only handed to a worker after it has been claimed inside a
+# write transaction, so two runs sharing the file never process the same URL.
+FRONTIER_PATH = os.getenv(
+    "CRAWL_FRONTIER",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontier.db")
+)
+MAX_ATTEMPTS = int(os.getenv("CRAWL_MAX_ATTEMPTS", "3"))
+# A claim older than this is treated as abandoned by a crashed run.
+CLAIM_TIMEOUT = int(os.getenv("CRAWL_CLAIM_TIMEOUT", "1800"))
+
+DISCOVERED = "discovered"
+FETCHED = "fetched"
+ENRICHED = "enriched"
+INJECTED = "injected"
+FAILED = "failed"
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS frontier (
+        url TEXT PRIMARY KEY,
+        platform TEXT NOT NULL,
+        state TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        extra TEXT NOT NULL DEFAULT '{}',
+        claimed_by TEXT,
+        claimed_at REAL,
+        last_error TEXT,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS frontier_platform_state ON frontier (platform, state);
+"""
+
+# Anything not finished, not out of attempts and not held by a live claim.
+CLAIMABLE = """
+    state != 'injected'
+    AND (state != 'failed' OR attempts < ?)
+    AND (claimed_by IS NULL OR claimed_at < ?)
+"""
+
+class Frontier:
+    def __init__(self, path=FRONTIER_PATH, max_attempts=MAX_ATTEMPTS, claim_timeout=CLAIM_TIMEOUT):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.claim_timeout = claim_timeout
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def _claimable_args(self):
+        return (self.max_attempts, time.time() - self.claim_timeout)
+
+    def add(self, platform, url, extra=None):
+        self.conn.execute(
+            "INSERT OR IGNORE INTO frontier (url, platform, state, extra, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (url, platform, DISCOVERED, json.dumps(extra or {}), time.time())
+        )
+
+    def claim(self, url):
+        now = time.time()
+        cursor = self.conn.execute(
+            f"""UPDATE frontier SET claimed_by = ?, claimed_at = ?, attempts = attempts + 1, updated_at = ?
+                WHERE url = ? AND {CLAIMABLE}""",
+            (self.owner, now, now, url, *self._claimable_args())
+        )
+        return cursor.rowcount == 1
+
+    def held_elsewhere(self, url):
+        # True while another live run holds the URL's claim.
+        row = self.conn.execute(
+            "SELECT 1 FROM frontier WHERE url = ? AND claimed_by IS NOT NULL AND claimed_by != ? AND claimed_at >= ?",
+            (url, self.owner, time.time() - self.claim_timeout)
+        ).fetchone()
+        return row is not None
+
+    def requeue(self, url):
+        # Makes a finished URL claimable again, e.g. to recrawl it for changes.
+        self.conn.execute(
+            "UPDATE frontier SET state = ?, attempts = 0, last_error = NULL, updated_at = ? WHERE url = ? AND state IN (?, ?) AND claimed_by IS NULL",
+            (DISCOVERED, time.time(), url, INJECTED, FAILED)
+        )
+
+    def claim_pending(self, platform, limit=None):
+        # Claims URLs left over from earlier runs, oldest first.
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.conn.execute(
+                f"SELECT url, extra FROM frontier WHERE platform = ? AND {CLAIMABLE} ORDER BY updated_at LIMIT ?",
+                (platform, *self._claimable_args(), -1 if limit is None else limit)
+            ).fetchall()
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE frontier SET claimed_by = ?, claimed_at = ?, attempts = attempts + 1, updated_at = ? WHERE url = ?",
+                [(self.owner, now, now, url) for url, _ in rows]
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return [(url, json.loads(extra)) for url, extra in rows]
+
+    def mark(self, url, state, error=None):
+        # Finished and failed URLs give up their claim; intermediate states
+        # refresh it so a long enrichment is not mistaken for a dead run.
+        now = time.time()
+        if state in (INJECTED, FAILED):
+            self.conn.execute(
+                "UPDATE frontier SET state = ?, last_error = ?, claimed_by = NULL, claimed_at = NULL, updated_at = ? WHERE url = ?",
+                (state, error, now, url)
+            )
+        else:
+            self.conn.execute(
+                "UPDATE frontier SET state = ?, claimed_at = ?, updated_at = ? WHERE url = ?",
+                (state, now, now, url)
+            )
+
+    def counts(self, platform):
+        rows = self.conn.execute(
+            "SELECT state, COUNT(*) FROM frontier WHERE platform = ? GROUP BY state", (platform,)
+        ).fetchall()
+        return dict(rows)
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+import psycopg2
+from cuid import cuid
+from psycopg2.extras import Json
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from supervisor import EXCLUSIVE_PLATFORMS, HANDLERS, load_handler
+
+# Crawl work shared between nodes through the "CrawlJob" table in projectdb.
+# A node claims a job with FOR UPDATE SKIP LOCKED, so two nodes never get the
+# same row, and holds it under a lease it keeps extending while the handler
+# runs. A node that dies stops heartbeating; once its lease lapses the job is
+# handed out again, and after maxAttempts it is dead-lettered.
+#
+# Thingiverse scans keep their checkpoint on the node that runs them, so only
+# one job of an exclusive platform runs at a time across all nodes. Claims
+# take a transaction-scoped advisory lock, so two nodes cannot both see no
+# running Thingiverse job and start one each.
+#
+#   python job_queue.py enqueue Thangs '["Fashion", "Clothing", 20]'
+#   python job_queue.py work 2
+#   python job_queue.py status
+LEASE_SECONDS = int(os.getenv("CRAWL_JOB_LEASE", "300"))
+HEARTBEAT_SECONDS = int(os.getenv("CRAWL_JOB_HEARTBEAT", "60"))
+RETRY_BASE_SECONDS = int(os.getenv("CRAWL_JOB_RETRY_BASE", "60"))
+POLL_SECONDS = int(os.getenv("CRAWL_JOB_POLL", "10"))
+MAX_ATTEMPTS = int(os.getenv("CRAWL_JOB_MAX_ATTEMPTS", "3"))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+DEAD = "dead"
+
+# Key of the advisory lock that serializes claims.
+CLAIM_LOCK = 72_104_311
+
+def connect():
+    return psycopg2.connect(
+        dbname="projectdb",
+        user="postgres",
+        password="mypassword",
+        host="localhost",
+        port="5432"
+    )
+
+class JobQueue:
+    def __init__(self, conn=None):
+        self.conn = conn or connect()
+        # Slots share the connection from worker threads; each statement and
+        # its commit must not interleave with another slot's.
+        self.lock = threading.Lock()
+        self.worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def _execute(self, query, args=(), advisory_lock=None):
+        with self.lock:
+            try:
+                with self.conn.cursor() as cursor:
+                    if advisory_lock is not None:
+                        # Released by the commit or rollback below.
+                        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (advisory_lock,))
+                    cursor.execute(query, args)
+                    rows = cursor.fetchall() if cursor.description else cursor.rowcount
+                self.conn.commit()
+                return rows
+            except psycopg2.Error:
+                self.conn.rollback()
+                raise
+
+    def enqueue(self, platform, args, priority=0, max_attempts=MAX_ATTEMPTS):
+        if platform not in HANDLERS:
+            raise ValueError(f"No crawl handler for {platform}")
+        job_id = cuid()
+        self._execute(
+            """INSERT INTO "CrawlJob" (id, platform, args, status, priority, "maxAttempts", "runAfter", "createdAt", "updatedAt")
+               VALUES (%s, %s, %s, %s, %s, %s, now(), now(), now())""",
+            (job_id, platform, Json(args), PENDING, priority, max_attempts)
+        )
+        return job_id
+
+    def expire_leases(self):
+        # Jobs whose node stopped heartbeating go back to pending, or to the
+        # dead letters if they have used up their attempts.
+        return self._execute(
+            """UPDATE "CrawlJob"
+               SET status = CASE WHEN attempts >= "maxAttempts" THEN %s ELSE %s END,
+                   "lockedBy" = NULL, "leaseUntil" = NULL,
+                   "lastError" = COALESCE("lastError", 'lease expired'), "updatedAt" = now()
+               WHERE status = %s AND "leaseUntil" < now()""",
+            (DEAD, PENDING, RUNNING)
+        )
+
+    def claim(self):
+        rows = self._execute(
+            """UPDATE "CrawlJob"
+               SET status = %s, "lockedBy" = %s, attempts = attempts + 1,
+                   "leaseUntil" = now() + make_interval(secs => %s), "heartbeatAt" = now(), "updatedAt" = now()
+               WHERE id = (
+                   SELECT id FROM "CrawlJob" job
+                   WHERE status = %s AND "runAfter" <= now()
+                     AND (platform <> ALL(%s::text[]) OR NOT EXISTS (
+                         SELECT 1 FROM "CrawlJob" running WHERE running.platform = job.platform AND running.status = %s
+                     ))
+                   ORDER BY priority DESC, "runAfter"
+                   LIMIT 1
+                   FOR UPDATE SKIP LOCKED
+               )
+               RETURNING id, platform, args, attempts, "maxAttempts"
+            """,
+            (RUNNING, self.worker, LEASE_SECONDS, PENDING, sorted(EXCLUSIVE_PLATFORMS), RUNNING),
+            advisory_lock=CLAIM_LOCK
+        )
+        if not rows:
+            return None
+        job_id, platform, args, attempts, max_attempts = rows[0]
+        return {"id": job_id, "platform": platform, "args": args, "attempts": attempts, "max_attempts": max_attempts}
+
+    def heartbeat(self, job_id):
+        # False when the lease was lost, e.g. after a long stall let it lapse
+        # and another node took the job over.
+        return self._execute(
+            """UPDATE "CrawlJob" SET "leaseUntil" = now() + make_interval(secs => %s), "heartbeatAt" = now()
+               WHERE id = %s AND "lockedBy" = %s AND status = %s""",
+            (LEASE_SECONDS, job_id, self.worker, RUNNING)
+        ) == 1
+
+    def complete(self, job_id, result):
+        self._execute(
+            """UPDATE "CrawlJob" SET status = %s, result = %s, "lockedBy" = NULL, "leaseUntil" = NULL, "updatedAt" = now()
+               WHERE id = %s AND "lockedBy" = %s""",
+            (DONE, Json(result), job_id, self.worker)
+        )
+
+    def fail(self, job, error):
+        # Retries back off exponentially; the last failure dead-letters the job.
+        dead = job["attempts"] >= job["max_attempts"]
+        delay = RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1)
+        self._execute(
+            """UPDATE "CrawlJob" SET status = %s, "lastError" = %s, "lockedBy" = NULL, "leaseUntil" = NULL,
+                   "runAfter" = now() + make_interval(secs => %s), "updatedAt" = now()
+               WHERE id = %s AND "lockedBy" = %s""",
+            (DEAD if dead else PENDING, error, delay, job["id"], self.worker)
+        )
+        return dead
+
+    def retry_dead(self, platform=None):
+        return self._execute(
+            """UPDATE "CrawlJob" SET status = %s, attempts = 0, "runAfter" = now(), "updatedAt" = now()
+               WHERE status = %s AND (%s::text IS NULL OR platform = %s)""",
+            (PENDING, DEAD, platform, platform)
+        )
+
+    def counts(self):
+        return self._execute(
+            'SELECT platform, status, COUNT(*) FROM "CrawlJob" GROUP BY platform, status ORDER BY platform, status'
+        )
+
+    def close(self):
+        self.conn.close()
+
+def _summary(result):
+    if isinstance(result, list):
+        return {"items": len(result)}
+    return {"result": result}
+
+async def _heartbeat(queue, job_id, lost):
+    while True:
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        try:
+            alive = await asyncio.to_thread(queue.heartbeat, job_id)
+        except psycopg2.Error as e:
+            # Keep trying; the lease outlives a few missed beats.
+            print(f"[jobs] heartbeat for {job_id} failed: {e}")
+            continue
+        if not alive:
+            print(f"[jobs] lost the lease on {job_id}")
+            lost.set()
+            return
+
+async def run_job(queue, job):
+    # Runs the platform handler while heartbeating. If the lease is lost the
+    # handler is cancelled, since another node now owns the job.
+    print(f"[jobs] {queue.worker} running {job['platform']} {job['args']} (attempt {job['attempts']})")
+    lost = asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(queue, job["id"], lost))
+    handler = asyncio.create_task(load_handler(job["platform"])(*job["args"]))
+    lost_wait = asyncio.create_task(lost.wait())
+    started = time.monotonic()
+    try:
+        await asyncio.wait({handler, lost_wait}, return_when=asyncio.FIRST_COMPLETED)
+        if not handler.done():
+            handler.cancel()
+            return
+        try:
+            result = handler.result()
+        except Exception as e:
+            dead = await asyncio.to_thread(queue.fail, job, str(e))
+            print(f"[jobs] {job['platform']} {job['args']} failed{' for good' if dead else ''}: {e}")
+            return
+        summary = {**_summary(result), "elapsed": round(time.monotonic() - started, 1)}
+        await asyncio.to_thread(queue.complete, job["id"], summary)
+        print(f"[jobs] {job['platform']} {job['args']} done: {summary}")
+    finally:
+        heartbeat.cancel()
+        lost_wait.cancel()
+
+async def work(slots=1, idle_exit=False):
+    # Each slot claims and runs one job at a time; nodes add capacity simply
+    # by running more of these.
+    from browser_pool import close_pools
+    queue = JobQueue()
+
+    async def slot():
+        while True:
+            await asyncio.to_thread(queue.expire_leases)
+            job = await asyncio.to_thread(queue.claim)
+            if job is None:
+                if idle_exit:
+                    return
+                await asyncio.sleep(POLL_SECONDS)
+                continue
+            await run_job(queue, job)
+
+    try:
+        await asyncio.gather(*(slot() for _ in range(slots)))
+    finally:
+        await close_pools()
+        queue.close()
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "enqueue":
+        print(JobQueue().enqueue(sys.argv[2], json.loads(sys.argv[3]) if len(sys.argv) > 3 else []))
+    elif command == "work":
+        asyncio.run(work(int(sys.argv[2]) if len(sys.argv) > 2 else 1))
+    elif command == "retry-dead":
+        print(f"{JobQueue().retry_dead(sys.argv[2] if len(sys.argv) > 2 else None)} jobs requeued")
+    else:
+        for platform, status, count in JobQueue().counts():
+            print(f"{platform}: {status} {count}")
@@ -0,0 +1,142 @@
+import asyncio
+import collections
+import contextvars
+import os
+import random
+import time
+import openai
+from dotenv import load_dotenv
+load_dotenv()
+
+# Shared async access to the OpenAI API for every enrichment in the process.
+# Calls wait for a concurrency slot and for room in the per-minute request
+# and token budgets, so a crawl never fires more than the account allows,
+# and rate-limit or transient errors are retried with jittered backoff.
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+LLM_RPM = int(os.getenv("LLM_RPM", "500"))
+LLM_TPM = int(os.getenv("LLM_TPM", "30000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+
+# Rough prompt-size estimate made before the call; corrected with the real
+# usage once the response arrives.
+CHARS_PER_TOKEN = 4
+IMAGE_TOKENS = {"low": 85, "high": 765, "auto": 765}
+DEFAULT_COMPLETION_TOKENS = 500
+
+# Set by callers that want the token usage of the calls made on their
+# behalf, e.g. to price cached results.
+usage_sink = contextvars.ContextVar("usage_sink", default=None)
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError
+)
+
+def estimate_tokens(messages, max_tokens=None):
+    tokens = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            tokens += len(content) // CHARS_PER_TOKEN
+            continue
+        for part in content:
+            if part["type"] == "text":
+                tokens += len(part["text"]) // CHARS_PER_TOKEN
+            else:
+                tokens += IMAGE_TOKENS.get(part["image_url"].get("detail", "auto"), 765)
+    return tokens + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+class MinuteBudget:
+    # Sliding 60-second window over requests and tokens.
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = collections.deque()
+        self.tokens = 0
+
+    def _expire(self, now):
+        while self.window and now - self.window[0][0] >= 60:
+            _, tokens = self.window.popleft()
+            self.tokens -= tokens[0]
+
+    async def reserve(self, tokens):
+        # A single request bigger than the whole TPM budget still goes
+        # through once the window is empty.
+        while True:
+            now = time.monotonic()
+            self._expire(now)
+            fits_tokens = self.tokens + tokens <= self.tpm or not self.window
+            if len(self.window) < self.rpm and fits_tokens:
+                entry = [tokens]
+                self.window.append((now, entry))
+                self.tokens += tokens
+                return entry
+            await asyncio.sleep(max(0.05, 60 - (now - self.window[0][0])))
+
+    def settle(self, entry, actual_tokens):
+        self.tokens += actual_tokens - entry[0]
+        entry[0] = actual_tokens
+
+class LlmClient:
+    def __init__(self, concurrency=LLM_CONCURRENCY, budget=None):
+        self.client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.budget = budget or MinuteBudget()
+        self.calls = 0
+        self.retries = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    async def chat(self, **kwargs):
+        estimate = estimate_tokens(kwargs["messages"], kwargs.get("max_tokens"))
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            async with self.semaphore:
+                entry = await self.budget.reserve(estimate)
+                try:
+                    response = await self.client.chat.completions.create(**kwargs)
+                except RETRYABLE_ERRORS as e:
+                    if attempt == LLM_MAX_RETRIES:
+                        raise
+                    error = e
+                else:
+                    self.calls += 1
+                    if response.usage is not None:
+                        self.prompt_tokens += response.usage.prompt_tokens
+                        self.completion_tokens += response.usage.completion_tokens
+                        self.budget.settle(entry, response.usage.total_tokens)
+                        sink = usage_sink.get()
+                        if sink is not None:
+                            sink.append((response.usage.prompt_tokens, response.usage.completion_tokens))
+                    return response
+            # Full jitter, so workers that were throttled together do not
+            # come back together.
+            self.retries += 1
+            delay = random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * 2 ** attempt))
+            print(f"[llm] {type(error).__name__}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    def report(self):
+        print(f"[llm] {self.calls} calls, {self.retries} retries, "
+              f"{self.prompt_tokens} prompt + {self.completion_tokens} completion tokens")
+
+# One client per event loop: the semaphore and the HTTP connections belong
+# to the loop that created them.
+_clients = {}
+
+def get_client():
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        _clients.clear()
+        _clients[loop] = LlmClient()
+    return _clients[loop]
+
+async def chat(**kwargs):
+    return await get_client().chat(**kwargs)
+
+def report_llm():
+    for client in _clients.values():
+        client.report()
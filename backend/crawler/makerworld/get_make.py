@@ -1,60 +1,57 @@
-from playwright.async_api import async_playwright
-import asyncio
 import urllib.parse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from browser_pool import borrow_page, run_pooled, INFATICA_PROXY
+from extract_schema import validate
+from page_ready import wait_ready
+from typing import List, Optional, TypedDict
 
-async def get_info(url):
-    user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
+class MakerworldPage(TypedDict):
+    title: str
+    description: str
+    tags: List[str]
+    thumbnails: List[Optional[str]]
 
-    info = []
+READY_SELECTORS = ['h1.title-for-share', 'span.MuiChip-label', 'div.rich_text_show', 'div.swiper-wrapper']
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=False,
-            proxy={
-                "server": "http://pool.infatica.io:10000",
-                "username": "C0aeX1JZjKzfxgTQDpbG",
-                "password": "yl9xbHM8"
-            }    
-        )  # Set to True to hide the browser
-        page = await browser.new_page(user_agent=user_agent, 
-            viewport={"width": 1280, "height": 800},
-            locale="en-US"
-        )
+EXTRACT_JS = """
+    () => {
+        const container = document.querySelector('div.rich_text_show');
+        const stopNode = container.querySelector('.boostmeroot');
+        let description = '';
 
-        try:
-            await page.goto(url, timeout=60000, wait_until="domcontentloaded")
+        for (const child of container.childNodes) {
+            if (child === stopNode) break;
+            if (child.textContent) {
+                description += child.textContent.trim() + '\\n';
+            }
+        }
 
-            await page.wait_for_selector('h1.title-for-share')
-            title = await page.locator('h1.title-for-share').inner_text()
+        return {
+            title: document.querySelector('h1.title-for-share').innerText,
+            description: description.trim(),
+            tags: [...document.querySelectorAll('span.MuiChip-label')].map(tag => tag.innerText),
+            thumbnails: [...document.querySelectorAll('div.swiper-wrapper div.mw-css-mlkcqi img')]
+                .map(img => img.getAttribute('src'))
+        };
+    }
+"""
 
-            await page.wait_for_selector('span.MuiChip-label')
-            tag_elements = await page.query_selector_all('span.MuiChip-label')
-            tags = [await tag.inner_text() for tag in tag_elements]
+async def get_info(url):
+    info = []
 
-            await page.wait_for_selector('div.rich_text_show')
-            # description = (await page.locator('div.rich_text_show').inner_text()).strip()
-            description = await page.evaluate("""
-                () => {
-                    const container = document.querySelector('div.rich_text_show');
-                    const stopNode = container.querySelector('.boostmeroot');
-                    let result = '';
+    async with borrow_page(proxy=INFATICA_PROXY, platform="Makerworld") as page:
+        try:
+            response = await page.goto(url, timeout=60000, wait_until="domcontentloaded")
 
-                    for (const child of container.childNodes) {
-                        if (child === stopNode) break;
-                        if (child.textContent) {
-                            result += child.textContent.trim() + '\\n';
-                        }
-                    }
-                    return result.trim();
-                }
-            """)
+            ready = await wait_ready(page, READY_SELECTORS, response=response, platform="Makerworld")
+            if not ready.ok:
+                return None
+            data = validate(await page.evaluate(EXTRACT_JS), MakerworldPage)
 
             image_urls = []
-            await page.wait_for_selector('div.swiper-wrapper')
-
-            thumb_imgs = await page.query_selector_all('div.swiper-wrapper div.mw-css-mlkcqi img')
-            for thumb in thumb_imgs:
-                src = await thumb.get_attribute('src')
+            for src in data["thumbnails"]:
                 if src:
                     parsed = urllib.parse.urlparse(src)
                     decoded_query = urllib.parse.unquote(parsed.query)
@@ -63,9 +60,9 @@ async def get_info(url):
                     image_urls.append([new_url, src])
 
 
-            info.append({"title" : title})
-            info.append({"description" : description})
-            info.append({"tags" : tags})
+            info.append({"title" : data["title"]})
+            info.append({"description" : data["description"]})
+            info.append({"tags" : data["tags"]})
             info.append({"image_urls" : image_urls})
             # info.append({"price" : price})
             return(info)
@@ -73,11 +70,9 @@ async def get_info(url):
         except Exception as e:
             print(f"Error loading page: {e}")
             return None
-        finally:
-            await browser.close()
 
 if __name__ == "__main__":
     url = 'https://makerworld.com/en/models/1651943-a1-a1-mini-screw-map-organizer-holder-for-extruder'
-    result = asyncio.run(get_info(url))
+    result = run_pooled(get_info(url))
 
     print(result)
\ No newline at end of file
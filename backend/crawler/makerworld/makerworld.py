@@ -1,84 +1,52 @@
-from playwright.sync_api import sync_playwright
-import asyncio
 from get_make import get_info
+from search_api import iter_hit_pages
 import os
 import sys
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 sys.path.append(project_root)
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from ai_enricher import enrich_data
-from src.utils.injection import url_exists_in_db, inject_database
+from browser_pool import run_pooled
+from pipeline import PlatformAdapter, from_list, run_pipeline, run_recrawl
+from src.utils.injection import known_urls
 
 def url_from_id_slug(model_id, slug):
     return f"https://makerworld.com/en/models/{model_id}-{slug}"
 
-def scrape_makerworld(num):
-    base_url = "https://makerworld.com/api/v1/search-service/select/design2?orderBy=hotScore&designCreateSince=7&searchSessionId=ux4y8XlWMjWHkUlIQIPhZcjyid09fsqAjHqEvWWfIjeB&entrance=home"
+async def discover_makerworld(num):
     collected_urls = []
-    limit=1
-    offset=0
-    while len(collected_urls) < num:
-        url = f"{base_url}&limit={limit}&offset={offset}"
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=False)
-            context = browser.new_context()
-            page = context.new_page()
-
-            # Intercept and capture the JSON response
-            json_data = {}
-
-            def handle_response(response):
-                if url in response.url:
-                    try:
-                        body = response.json()
-                        json_data.update(body)
-                    except:
-                        pass
-
-            page.on("response", handle_response)
-            page.goto(url)
-
-            # Wait briefly to ensure response is handled
-            page.wait_for_timeout(500)
-
-            if json_data:
-                hits = json_data.get("hits", [])
-                for item in hits:
-                    model_url = url_from_id_slug(item["id"], item["slug"])
-                    if model_url and not url_exists_in_db(model_url) and model_url not in collected_urls:
-                        collected_urls.append(model_url)
-            else:
-                print("No JSON data captured.")
-                break
-
-            offset += limit
-            print(collected_urls, offset, limit)
-
-            browser.close()
-    return collected_urls
-
-async def pass_AI(results): 
-    for url in results:
-        merged_info = {}
-        info = await get_info(url)
-        if not info:
-            continue
-
-        for item in info:
-            if isinstance(item, dict):
-                merged_info.update(item)
-        merged_info["source_url"] = url
-        merged_info["platform"] = "Makerworld"
-        merged_info["thumbnail_url"] = info[3]["image_urls"][0][0]
-        merged_info["price"] = "Free"
-        res = enrich_data(merged_info)
-        if res == None:
-            continue
-        else:
-            await inject_database(res)
+    async for hits in iter_hit_pages():
+        # Each search page is checked against the catalogue in one query.
+        urls = [url_from_id_slug(item["id"], item["slug"]) for item in hits]
+        for model_url in known_urls.filter_new("Makerworld", urls):
+            if model_url not in collected_urls:
+                collected_urls.append(model_url)
+                yield model_url
+                if len(collected_urls) >= num:
+                    break
+        if len(collected_urls) >= num:
+            break
+    print(f"Discovered {len(collected_urls)} Makerworld models")
+
+async def scrape_makerworld(num):
+    return [model_url async for model_url in discover_makerworld(num)]
+
+def prepare_model(merged_info):
+    merged_info["thumbnail_url"] = merged_info["image_urls"][0][0]
+    merged_info["price"] = "Free"
+
+async def pass_AI(results, concurrency=None):
+    adapter = PlatformAdapter("Makerworld", from_list(results), get_info, prepare_model)
+    return await run_pipeline(adapter, fetch_workers=concurrency, limit=len(results))
+
+async def crawl_makerworld(num, concurrency=None):
+    # Models are fetched and enriched while the search API is still paging.
+    adapter = PlatformAdapter("Makerworld", discover_makerworld(num), get_info, prepare_model)
+    return await run_pipeline(adapter, fetch_workers=concurrency, limit=num)
+
+async def recrawl_makerworld(num, concurrency=None):
+    return await run_recrawl("Makerworld", get_info, num, prepare=prepare_model, fetch_workers=concurrency)
 
 if __name__ == "__main__":
     # number = int(sys.argv[1])
-    # results = scrape_makerworld(number)
-    results = scrape_makerworld(1)
-    asyncio.run(pass_AI(results))
\ No newline at end of file
+    # run_pooled(crawl_makerworld(number))
+    run_pooled(crawl_makerworld(1))
\ No newline at end of file
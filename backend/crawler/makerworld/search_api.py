@@ -0,0 +1,74 @@
+import httpx
+import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from browser_pool import borrow_page, user_agent
+from rate_limiter import limiter
+
+SEARCH_URL = "https://makerworld.com/api/v1/search-service/select/design2"
+SEARCH_PARAMS = {
+    "orderBy": "hotScore",
+    "designCreateSince": 7,
+    "searchSessionId": "ux4y8XlWMjWHkUlIQIPhZcjyid09fsqAjHqEvWWfIjeB",
+    "entrance": "home"
+}
+
+# Hits requested per call and how many offsets are fetched at once.
+PAGE_SIZE = int(os.getenv("MAKERWORLD_PAGE_SIZE", "50"))
+PAGE_CONCURRENCY = int(os.getenv("MAKERWORLD_PAGE_CONCURRENCY", "4"))
+
+REFUSED_STATUSES = {401, 403, 429}
+
+class SearchRefused(Exception):
+    pass
+
+def search_url(offset, limit):
+    params = {**SEARCH_PARAMS, "limit": limit, "offset": offset}
+    return str(httpx.URL(SEARCH_URL, params=params))
+
+async def fetch_page_http(client, offset, limit):
+    url = search_url(offset, limit)
+    await limiter.acquire(url)
+    response = await client.get(url)
+    limiter.record_status(url, response.status_code, response.headers)
+    if response.status_code in REFUSED_STATUSES or response.status_code >= 500:
+        raise SearchRefused(f"status {response.status_code}")
+    try:
+        return response.json()
+    except ValueError:
+        # A challenge page instead of JSON
+        raise SearchRefused("response was not JSON")
+
+async def fetch_page_browser(offset, limit):
+    async with borrow_page() as page:
+        response = await page.goto(search_url(offset, limit), timeout=60000)
+        if response is None or not response.ok:
+            return {}
+        try:
+            return await response.json()
+        except Exception:
+            return {}
+
+async def fetch_hits(client, offset, limit):
+    try:
+        body = await fetch_page_http(client, offset, limit)
+    except (SearchRefused, httpx.HTTPError) as e:
+        print(f"Search API refused offset {offset} ({e}), falling back to browser")
+        body = await fetch_page_browser(offset, limit)
+    return body.get("hits", [])
+
+async def iter_hit_pages(page_size=PAGE_SIZE, concurrency=PAGE_CONCURRENCY):
+    # Yields the hits of each search page as a list, in offset order.
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    headers = {"User-Agent": user_agent, "Accept": "application/json"}
+    async with httpx.AsyncClient(headers=headers, limits=limits, timeout=30) as client:
+        offset = 0
+        while True:
+            offsets = [offset + i * page_size for i in range(concurrency)]
+            pages = await asyncio.gather(*(fetch_hits(client, o, page_size) for o in offsets))
+            offset += concurrency * page_size
+            for hits in pages:
+                if not hits:
+                    return
+                yield hits
@@ -0,0 +1,106 @@
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import time
+from rate_limiter import limiter, retry_after_seconds, THROTTLE_STATUSES
+
+# Shown instead of the real page when a site challenges or rejects us.
+BLOCKED_PAGE_SELECTORS = [
+    '#challenge-form',
+    '#cf-error-details',
+    'iframe[src*="captcha"]',
+    'div[class*="captcha"]'
+]
+
+RACE_JS = """
+    ([ready, failed]) => {
+        for (const selector of failed) {
+            if (document.querySelector(selector)) return selector;
+        }
+        return ready.every(selector => document.querySelector(selector)) ? 'ready' : false;
+    }
+"""
+
+class ReadyResult:
+    def __init__(self, state, condition, elapsed_ms):
+        self.state = state
+        self.condition = condition
+        self.elapsed_ms = elapsed_ms
+
+    @property
+    def ok(self):
+        return self.state == "ready"
+
+    def __repr__(self):
+        return f"ReadyResult({self.state}, {self.condition!r}, {self.elapsed_ms:.0f}ms)"
+
+class ReadinessStats:
+    def __init__(self, platform):
+        self.platform = platform
+        self.outcomes = {}
+
+    def record(self, result):
+        key = (result.state, result.condition)
+        count, total_ms = self.outcomes.get(key, (0, 0.0))
+        self.outcomes[key] = (count + 1, total_ms + result.elapsed_ms)
+
+    def report(self):
+        parts = [
+            f"{state} via {condition} x{count} (avg {total_ms / count:.0f}ms)"
+            for (state, condition), (count, total_ms) in self.outcomes.items()
+        ]
+        return f"[{self.platform}] readiness: " + "; ".join(parts)
+
+stats = {}
+
+def _record(platform, result):
+    if platform is None:
+        return
+    if platform not in stats:
+        stats[platform] = ReadinessStats(platform)
+    stats[platform].record(result)
+
+async def wait_ready(page, ready, failed=(), response=None, timeout=30000, platform=None):
+    # Races the selectors that mean "the page rendered" against the ones that
+    # mean "error/404/challenge page" and returns as soon as either shows up,
+    # instead of waiting out a fixed timeout for the error page first.
+    started = time.monotonic()
+    elapsed = lambda: (time.monotonic() - started) * 1000
+
+    if response is not None and response.status >= 400:
+        result = ReadyResult("failed", f"HTTP {response.status}", elapsed())
+    else:
+        try:
+            handle = await page.wait_for_function(
+                RACE_JS,
+                arg=[list(ready), list(failed) + BLOCKED_PAGE_SELECTORS],
+                timeout=timeout
+            )
+            condition = await handle.json_value()
+            if condition == "ready":
+                result = ReadyResult("ready", "ready", elapsed())
+            else:
+                result = ReadyResult("failed", condition, elapsed())
+        except PlaywrightTimeoutError:
+            result = ReadyResult("timeout", None, elapsed())
+
+    _record(platform, result)
+    _feed_limiter(page, response, result)
+    if result.state == "timeout":
+        raise TimeoutError(f"Page not ready after {timeout}ms: {page.url}")
+    return result
+
+def _feed_limiter(page, response, result):
+    # Tells the host's rate limiter how the page went: rendered pages let it
+    # speed up, while throttling statuses, challenge pages, server errors and
+    # timeouts slow it down. A platform's own "not found" page is neutral.
+    url = response.url if response is not None else page.url
+    if result.ok:
+        limiter.record(url, True)
+    elif result.state == "timeout" or result.condition in BLOCKED_PAGE_SELECTORS:
+        limiter.record(url, False)
+    elif response is not None and (response.status in THROTTLE_STATUSES or response.status >= 500):
+        limiter.record(url, False, retry_after_seconds(response.headers))
+
+def report_readiness():
+    for platform_stats in stats.values():
+        print(platform_stats.report())
+    stats.clear()
@@ -1,40 +1,55 @@
-from playwright.async_api import async_playwright
-import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from browser_pool import borrow_page, run_pooled, INFATICA_PROXY
+from extract_schema import validate
+from page_ready import wait_ready
+from typing import List, Optional, TypedDict
 
 def normalize_url(url: str) -> str:
     if url.startswith("//"):
         return "https:" + url
     return url
 
-async def get_info(url):
-    user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
+class PinshapePage(TypedDict):
+    title: str
+    button_text: Optional[str]
+    paragraphs: List[str]
+    tags: List[str]
+    thumbnails: List[str]
+    carousel: List[str]
+
+EXTRACT_JS = """
+    () => {
+        const all = (selector) => [...document.querySelectorAll(selector)];
+        const sources = (selector) => all(selector).map(img => img.getAttribute('src')).filter(Boolean);
+        const button = document.querySelector('button.btn.btn-primary.btn-lg');
+        return {
+            title: document.querySelector('h1.fw-bold').innerText,
+            button_text: button ? button.textContent : null,
+            paragraphs: all('div.description-content p').map(p => p.innerText),
+            tags: all('div.tags a.tag').map(tag => tag.innerText),
+            thumbnails: sources('div.thumbnail-carousel img'),
+            carousel: sources('div.position-relative img')
+        };
+    }
+"""
 
+async def get_info(url):
     info = []
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=False,
-            proxy={
-                "server": "http://pool.infatica.io:10000",
-                "username": "C0aeX1JZjKzfxgTQDpbG",
-                "password": "yl9xbHM8"
-            } 
-        )  # Set to True to hide the browser
-        page = await browser.new_page(user_agent=user_agent, 
-            viewport={"width": 1280, "height": 800},
-            locale="en-US"
-        )
-
+    async with borrow_page(proxy=INFATICA_PROXY, platform="Pinshape") as page:
         try:
-            await page.goto(url, timeout=60000, wait_until="domcontentloaded")
+            response = await page.goto(url, timeout=60000, wait_until="domcontentloaded")
             
-            await page.wait_for_selector('h1.fw-bold')
-            title = await page.locator('h1.fw-bold').inner_text()
-
-            button = page.locator("button.btn.btn-primary.btn-lg")
-
-            if await button.count() > 0:
-                text = await button.text_content()
+            ready = await wait_ready(page, ['h1.fw-bold'], response=response, platform="Pinshape")
+            if not ready.ok:
+                return None
+            data = validate(await page.evaluate(EXTRACT_JS), PinshapePage)
+            title = data["title"]
+
+            if data["button_text"] is not None:
+                text = data["button_text"]
                 # print("Button Text:", text)
 
                 # Extract the price using string parsing
@@ -52,13 +67,11 @@ async def get_info(url):
             # if price == "":
             #     price = "Free"
 
-            paragraphs = await page.locator('div.description-content p').all_inner_texts()
+            paragraphs = data["paragraphs"]
             # Filter out empty strings and join the rest
             description = " ".join(p.strip() for p in paragraphs if p.strip())
 
-            tag_locator = page.locator('div.tags a.tag')
-            tags = await tag_locator.all_inner_texts()
-            tags = [tag.strip() for tag in tags if tag.strip()]
+            tags = [tag.strip() for tag in data["tags"] if tag.strip()]
             # carousel_locator = page.locator('div.article-image img')
             # carousel_urls = await carousel_locator.evaluate_all(
             #     '(elements) => elements.map(img => img.getAttribute("src"))'
@@ -67,10 +80,7 @@ async def get_info(url):
             # # Optional: prepend "https:" if URLs start with "//"
             # carousel_urls = [f"https:{url}" if url.startswith("//") else url for url in carousel_urls]
 
-            thumbnail_locator = page.locator('div.thumbnail-carousel img')
-            thumbnail_urls = await thumbnail_locator.evaluate_all(
-                '(elements) => elements.map(img => img.getAttribute("src"))'
-            )
+            thumbnail_urls = data["thumbnails"]
 
             # Normalize URLs (prepend "https:" if needed)
             thumbnail_urls = [f"https:{url}" if url.startswith("//") else url for url in thumbnail_urls]
@@ -86,10 +96,7 @@ async def get_info(url):
             for i in range(len(carousel_urls)):
                 image_urls.append([normalize_url(carousel_urls[i]), normalize_url(filtered_thumbnail_urls[i])])
             if len(image_urls) == 0:
-                carousel_locator = page.locator('div.position-relative img')
-                carousel_urls = await carousel_locator.evaluate_all(
-                    '(elements) => elements.map(img => img.getAttribute("src"))'
-                )
+                carousel_urls = data["carousel"]
                 thumbnail_urls = [
                     url.replace('large_', 'small_')
                     for url in carousel_urls
@@ -107,9 +114,7 @@ async def get_info(url):
             
         except Exception as e:
             return f"Error loading page: {e}"
-        finally:
-            await browser.close()
 
 if __name__ == "__main__":
     url = 'https://pinshape.com/items/9407-the-t-rex-skull'
-    result = asyncio.run(get_info(url))
\ No newline at end of file
+    result = run_pooled(get_info(url))
\ No newline at end of file
@@ -1,77 +1,68 @@
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
-import asyncio
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from get_info import get_info
 import os
 import sys
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 sys.path.append(project_root)
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from ai_enricher import enrich_data
-from src.utils.injection import url_exists_in_db, inject_database
-
-user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
+from browser_pool import borrow_page, run_pooled
+from rate_limiter import limited_goto
+from pipeline import PlatformAdapter, run_pipeline, run_recrawl
+from src.utils.injection import known_urls
 
 results = []
 data = []
 
-async def scrape_pinshape(category_id, num):
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)  # Set headless=True if you don't want the browser to show
-        page = await browser.new_page(
-            user_agent=user_agent, 
-            viewport={"width": 1280, "height": 800},
-            locale="en-US"
-        )
+async def discover_pinshape(category_id, num):
+    # Listing pages come from the browser pool, so they share its per-host
+    # rate limiting with the detail pages.
+    async with borrow_page() as page:
         pagenum = 1
         collected_urls = []
         while len(collected_urls) < num:
             try:
-                await page.goto(f"https://pinshape.com/items?page={pagenum}&category={category_id}", timeout=60000, wait_until="domcontentloaded")
+                await limited_goto(page, f"https://pinshape.com/items?page={pagenum}&category={category_id}", timeout=60000, wait_until="domcontentloaded")
             except PlaywrightTimeoutError:
                 print(f"Attempt failed to load: ")
 
-            # Scroll down repeatedly to load more models
-
-            cards = page.locator('div.card-item')
-            count = await cards.count()
-            
-            for i in range(count):
-                card = cards.nth(i)
-
-                href_el = card.locator("a.text-decoration-none")
-                href = await href_el.first.get_attribute('href')
-                img_src_el = card.locator('img.item-image')
-                img_src = await img_src_el.get_attribute('src')
+            cards = await page.eval_on_selector_all('div.card-item', """
+                els => els.map(card => ({
+                    href: card.querySelector('a.text-decoration-none')?.getAttribute('href') ?? null,
+                    img: card.querySelector('img.item-image')?.getAttribute('src') ?? null
+                }))
+            """)
+            if not cards:
+                print("Reached last page")
+                break
 
+            thumbnails = {}
+            for card in cards:
+                href = card["href"]
+                img_src = card["img"]
                 full_href = "https://pinshape.com" + href if href and href.startswith("/") else href
                 full_img_src = "https:" + img_src if img_src and img_src.startswith("//") else img_src
+                if full_href:
+                    thumbnails.setdefault(full_href, full_img_src)
 
-                if full_href and not url_exists_in_db(full_href) and full_href not in collected_urls:
+            for full_href in known_urls.filter_new("Pinshape", list(thumbnails)):
+                full_img_src = thumbnails[full_href]
+                if full_href not in collected_urls:
                     collected_urls.append(full_href)
-                    merged_info = {}
-                    info = await get_info(full_href)
-                    if not info:
-                        continue
-
-                    for item in info:
-                        if isinstance(item, dict):
-                            merged_info.update(item)
-                    merged_info["source_url"] = full_href
-                    merged_info["platform"] = "Pinshape"
-                    merged_info["thumbnail_url"] = full_img_src
-                    res = enrich_data(merged_info)
-                    if res == None:
-                        continue
-                    else:
-                        await inject_database(res)
+                    yield (full_href, {"thumbnail_url": full_img_src})
                     if len(collected_urls) == num:
                         break
+
             pagenum += 1
 
-        await browser.close()
+async def scrape_pinshape(category_id, num, concurrency=None):
+    adapter = PlatformAdapter("Pinshape", discover_pinshape(category_id, num), get_info)
+    return await run_pipeline(adapter, fetch_workers=concurrency, limit=num)
+
+async def recrawl_pinshape(num, concurrency=None):
+    return await run_recrawl("Pinshape", get_info, num, fetch_workers=concurrency)
 
 if __name__ == "__main__":
     # category_id = int(sys.argv[1])
     # number = int(sys.argv[2])
-    # asyncio.run(scrape_pinshape(category_id, number))
-    asyncio.run(scrape_pinshape(3, 1))
\ No newline at end of file
+    # run_pooled(scrape_pinshape(category_id, number))
+    run_pooled(scrape_pinshape(3, 1))
\ No newline at end of file
@@ -0,0 +1,260 @@
+import asyncio
+import os
+import sys
+import time
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(project_root)
+from ai_enricher import enrich_data, ENRICHED_FIELDS
+from concurrency import concurrency_for
+from enrichment_cache import report_cache
+from llm_client import report_llm
+from subcategory_classifier import report_classifier
+from frontier import Frontier, FETCHED, ENRICHED, INJECTED, FAILED
+from src.utils.fingerprint import fingerprint, changed_fields
+from src.utils.injection import inject_database, get_fingerprint, update_model, source_urls_for_recrawl
+
+# discover -> fetch (get_info) -> enrich (LLM) -> inject (images + DB)
+#
+# Stages are connected by bounded queues, so a slow stage makes the ones in
+# front of it wait instead of piling up work in memory, and each stage has its
+# own worker count so browser, LLM and upload/DB work overlap. Every URL's
+# progress is recorded in the frontier so an interrupted run can resume.
+ENRICH_WORKERS = int(os.getenv("PIPELINE_ENRICH_WORKERS", "4"))
+INJECT_WORKERS = int(os.getenv("PIPELINE_INJECT_WORKERS", "2"))
+QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+
+# Enrichment outputs that depend on each scraped field. A recrawl that only
+# sees a new price or new source tags makes no LLM call at all.
+REENRICH = {
+    "title": ("description", "subcategory"),
+    "description": ("description", "subcategory"),
+    "image_urls": ("tags",)
+}
+
+_DONE = object()
+_UNCHANGED = object()
+
+class PlatformAdapter:
+    def __init__(self, platform, discover, parse, prepare=None):
+        # discover: async iterator of URLs or (url, extra fields) tuples
+        # parse:    a get_info coroutine function
+        # prepare:  optional hook to fill in platform defaults after parsing
+        self.platform = platform
+        self.discover = discover
+        self.parse = parse
+        self.prepare = prepare
+
+async def from_list(items):
+    for item in items:
+        yield item
+
+def merge_info(info):
+    merged_info = {}
+    for item in info:
+        if isinstance(item, dict):
+            merged_info.update(item)
+    return merged_info
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.done = 0
+        self.failed = 0
+        self.unchanged = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+
+    def report(self):
+        unchanged = f", {self.unchanged} unchanged" if self.unchanged else ""
+        return (f"{self.name}: {self.done} ok, {self.failed} failed{unchanged}, "
+                f"{self.busy:.1f}s busy, {self.blocked:.1f}s waiting on the next stage")
+
+class Pipeline:
+    def __init__(self, adapter, fetch_workers=None, enrich_workers=ENRICH_WORKERS, inject_workers=INJECT_WORKERS, queue_size=QUEUE_SIZE, frontier=None, recrawl=False, limit=None):
+        # recrawl: discovered URLs are fetched even if already injected, and
+        # models already in the catalogue are only updated where they changed.
+        # limit: the run's URL budget, shared by resumed and newly discovered URLs.
+        self.adapter = adapter
+        self.recrawl = recrawl
+        self.limit = limit
+        self.frontier = frontier or Frontier()
+        self.workers = {
+            "fetch": fetch_workers or concurrency_for(adapter.platform),
+            "enrich": enrich_workers,
+            "inject": inject_workers
+        }
+        self.queues = {name: asyncio.Queue(maxsize=queue_size) for name in self.workers}
+        self.stats = {name: StageStats(name) for name in ["discover", *self.workers]}
+        self.results = []
+
+    async def _put(self, stage, queue, item):
+        started = time.monotonic()
+        await queue.put(item)
+        self.stats[stage].blocked += time.monotonic() - started
+
+    async def _discover(self):
+        pending = self.frontier.claim_pending(self.adapter.platform, self.limit)
+        if pending:
+            print(f"[{self.adapter.platform}] resuming {len(pending)} URLs from the frontier")
+        for item in pending:
+            await self._put("discover", self.queues["fetch"], item)
+
+        budget = None if self.limit is None else self.limit - len(pending)
+        try:
+            if budget is not None and budget <= 0:
+                return
+            async for item in self.adapter.discover:
+                url, extra = item if isinstance(item, tuple) else (item, {})
+                self.frontier.add(self.adapter.platform, url, extra)
+                if self.recrawl:
+                    self.frontier.requeue(url)
+                if not self.frontier.claim(url):
+                    continue
+                self.stats["discover"].done += 1
+                await self._put("discover", self.queues["fetch"], (url, extra))
+                if budget is not None:
+                    budget -= 1
+                    if budget == 0:
+                        return
+        finally:
+            # Stops the listing crawl (and frees its page) once the budget is spent.
+            if hasattr(self.adapter.discover, "aclose"):
+                await self.adapter.discover.aclose()
+
+    async def _fetch(self, item):
+        url, extra = item
+        info = await self.adapter.parse(url)
+        if not info or isinstance(info, str):
+            print(f"Skipping {url}: {info or 'no data'}")
+            return None
+        merged_info = merge_info(info)
+        merged_info["source_url"] = url
+        merged_info["platform"] = self.adapter.platform
+        merged_info.update(extra)
+        if self.adapter.prepare:
+            self.adapter.prepare(merged_info)
+        merged_info["content_hash"], merged_info["field_hashes"] = fingerprint(merged_info)
+        if self.recrawl and not await self._check_changes(merged_info):
+            self.frontier.mark(url, INJECTED)
+            return _UNCHANGED
+        self.frontier.mark(url, FETCHED)
+        return merged_info
+
+    async def _check_changes(self, merged_info):
+        # Compares the fresh scrape with the fingerprint stored on the model.
+        # Returns False when nothing needs enriching, uploading or writing.
+        stored = get_fingerprint(merged_info["source_url"])
+        if stored is None:
+            return True
+        model_id, stored_hash, stored_fields = stored
+        if stored_hash == merged_info["content_hash"]:
+            return False
+        if stored_hash is None:
+            # Models injected before fingerprints existed: record a baseline
+            # rather than re-enriching the whole catalogue on the first pass.
+            await update_model(model_id, merged_info, [])
+            return False
+        merged_info["model_id"] = model_id
+        merged_info["changed"] = changed_fields(stored_fields, merged_info["field_hashes"])
+        if "image_urls" in merged_info["changed"]:
+            merged_info.setdefault("thumbnail_url", merged_info["image_urls"][0][1])
+        print(f"{merged_info['source_url']} changed: {', '.join(merged_info['changed'])}")
+        return True
+
+    async def _enrich(self, merged_info):
+        if "changed" in merged_info:
+            fields = {field for changed in merged_info["changed"] for field in REENRICH.get(changed, ())}
+        else:
+            fields = ENRICHED_FIELDS
+        if fields:
+            enriched = await enrich_data(merged_info, fields)
+        else:
+            enriched = merged_info
+        if enriched is not None:
+            self.frontier.mark(merged_info["source_url"], ENRICHED)
+        return enriched
+
+    async def _inject(self, enriched):
+        if "model_id" in enriched:
+            await update_model(enriched["model_id"], enriched, enriched["changed"])
+        else:
+            await inject_database(enriched)
+        self.frontier.mark(enriched["source_url"], INJECTED)
+        self.results.append(enriched)
+        return enriched
+
+    async def _worker(self, stage, handler, next_stage):
+        queue = self.queues[stage]
+        stats = self.stats[stage]
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                return
+            url = item[0] if isinstance(item, tuple) else item["source_url"]
+            started = time.monotonic()
+            error = None
+            try:
+                result = await handler(item)
+            except Exception as e:
+                print(f"Skipping {url} at {stage} because of error: {e}")
+                result = None
+                error = str(e)
+            stats.busy += time.monotonic() - started
+            if result is _UNCHANGED:
+                stats.unchanged += 1
+                continue
+            if result is None:
+                stats.failed += 1
+                self.frontier.mark(url, FAILED, error or f"no result from {stage}")
+                continue
+            stats.done += 1
+            if next_stage:
+                await self._put(stage, self.queues[next_stage], result)
+
+    async def _run_stage(self, stage, handler, next_stage):
+        await asyncio.gather(*(self._worker(stage, handler, next_stage) for _ in range(self.workers[stage])))
+        if next_stage:
+            for _ in range(self.workers[next_stage]):
+                await self.queues[next_stage].put(_DONE)
+
+    async def run(self):
+        async def discover():
+            try:
+                await self._discover()
+            except Exception as e:
+                print(f"Discovery stopped because of error: {e}")
+            finally:
+                for _ in range(self.workers["fetch"]):
+                    await self.queues["fetch"].put(_DONE)
+
+        await asyncio.gather(
+            discover(),
+            self._run_stage("fetch", self._fetch, "enrich"),
+            self._run_stage("enrich", self._enrich, "inject"),
+            self._run_stage("inject", self._inject, None)
+        )
+        self.report()
+        report_enrichment()
+        self.frontier.close()
+        return self.results
+
+    def report(self):
+        print(f"[{self.adapter.platform}] pipeline workers {self.workers}")
+        for stats in self.stats.values():
+            print(f"  {stats.report()}")
+        print(f"  frontier: {self.frontier.counts(self.adapter.platform)}")
+
+def report_enrichment():
+    # LLM usage, cache savings and classifier hits so far in this process.
+    report_llm()
+    report_cache()
+    report_classifier()
+
+async def run_pipeline(adapter, **options):
+    return await Pipeline(adapter, **options).run()
+
+async def run_recrawl(platform, parse, num=None, prepare=None, **options):
+    # Re-fetches models already in the catalogue, stalest first, and applies
+    # only what changed on the source site.
+    adapter = PlatformAdapter(platform, from_list(source_urls_for_recrawl(platform, num)), parse, prepare)
+    return await run_pipeline(adapter, recrawl=True, limit=num, **options)
@@ -1,71 +1,88 @@
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
-import asyncio
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from browser_pool import borrow_page, INFATICA_PROXY
+from extract_schema import validate
+from page_ready import wait_ready
+from typing import List, Optional, TypedDict
+
+class PrintablesPage(TypedDict):
+    title: Optional[str]
+    description: Optional[str]
+    price: Optional[str]
+    images: List[str]
+    tags: List[str]
+
+# Bounded waits for the tags section and for the tags "more" reveals.
+TAGS_TIMEOUT = 3000
+
+EXPANDED_JS = "shown => document.querySelectorAll('.tags-wrapper a.badge').length > shown"
+
+EXTRACT_JS = """
+    () => {
+        const text = (selector) => document.querySelector(selector)?.innerText ?? null;
+        return {
+            title: text('h1.svelte-6cpohy'),
+            description: text('div.user-inserted'),
+            price: text('div.price'),
+            images: [...document.querySelectorAll('ul[id*="splide01"] li.splide__slide img')]
+                .map(img => img.getAttribute('src'))
+                .filter(Boolean),
+            tags: [...document.querySelectorAll('.tags-wrapper a.badge')].map(tag => tag.innerText)
+        };
+    }
+"""
 
 async def get_info(url):
     
-    user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
-
     info = []
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=False,
-            proxy={
-                "server": "http://pool.infatica.io:10000",
-                "username": "C0aeX1JZjKzfxgTQDpbG",
-                "password": "yl9xbHM8"
-            }
-        )  # Set to True to hide the browser
-        page = await browser.new_page(user_agent=user_agent, 
-            viewport={"width": 1280, "height": 800},
-            locale="en-US"
-        )
-
+    async with borrow_page(proxy=INFATICA_PROXY, platform="Printables") as page:
         try:
-            await page.goto(url, timeout=60000, wait_until="domcontentloaded")
-
-            title_el = await page.query_selector('h1.svelte-6cpohy')
-            title = await title_el.inner_text() if title_el else "N/A"
-            info.append({"title" : title.strip()})
+            response = await page.goto(url, timeout=60000, wait_until="domcontentloaded")
 
-            description_el = await page.query_selector('div.user-inserted')
-            description = await description_el.inner_text() if description_el else "N/A"
-            info.append({"description" : description.strip()})
+            ready = await wait_ready(page, ['ul[id*="splide01"] li.splide__slide img'], response=response, timeout=5000, platform="Printables")
+            if not ready.ok:
+                return None
 
-            price_el = await page.query_selector('div.price')
-            if price_el:
-                price = await price_el.inner_text()
+            # The tags section can render after the carousel. Once it is there,
+            # "more" is either shown with it or not needed, and after a click
+            # the hidden tags are waited for before extracting.
+            try:
+                await page.wait_for_selector('.tags-wrapper', timeout=TAGS_TIMEOUT)
+            except PlaywrightTimeoutError:
+                print("Tags not found!")
+            more_button = await page.query_selector('button.more')
+            if more_button and await more_button.is_visible():
+                shown = await page.locator('.tags-wrapper a.badge').count()
+                await more_button.click(force=True)
+                try:
+                    await page.wait_for_function(EXPANDED_JS, arg=shown, timeout=TAGS_TIMEOUT)
+                except PlaywrightTimeoutError:
+                    print("Hidden tags did not show up!")
             else:
-                price = "Free"
-            info.append({"price" : price})
-            
-            await page.wait_for_selector('ul[id*="splide01"] li.splide__slide img', timeout=5000)
-            img_els = await page.query_selector_all('ul[id*="splide01"] li.splide__slide img')
-            img_urls = []
+                print("Button not found!")
+
+            data = validate(await page.evaluate(EXTRACT_JS), PrintablesPage)
 
-            for img in img_els:
-                src = await img.get_attribute('src')
+            img_urls = []
+            for src in data["images"]:
                 new_src = src.replace("/cover/320x240/", "/inside/1600x1200/")
                 img_urls.append([new_src, src])
-            info.append({"image_urls" : img_urls})
 
-            try:
-                await page.wait_for_selector('button.more', state='visible', timeout=5000)
-                await page.click('button.more', force=True)
-            except Exception as e:
-                print("Button not found!")
-
-            tags = await page.query_selector_all('.tags-wrapper a.badge')
-            info.append({"tags" : [await tag.inner_text() for tag in tags]})
+            info.append({"title" : (data["title"] or "N/A").strip()})
+            info.append({"description" : (data["description"] or "N/A").strip()})
+            info.append({"price" : data["price"] or "Free"})
+            info.append({"image_urls" : img_urls})
+            info.append({"tags" : data["tags"]})
 
             return info
         except Exception as e:
             return f"Error loading page: {e}"
-        finally:
-            await browser.close()
 
 # if __name__ == "__main__":
 
 #     url = 'https://www.printables.com/model/1351835-moving-single-eye'
-#     result = asyncio.run(get_info(url))
+#     result = run_pooled(get_info(url))
 #     print(result)
\ No newline at end of file
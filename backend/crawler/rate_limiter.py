@@ -0,0 +1,143 @@
+import asyncio
+import os
+import time
+from urllib.parse import urlsplit
+
+# One token bucket per host, shared by every page and HTTP client in the
+# process. The rate grows additively while responses are healthy and is cut
+# multiplicatively on 429s, challenge pages, server errors and timeouts, so
+# each site settles just under the rate it tolerates.
+INITIAL_RATE = float(os.getenv("RATE_LIMIT_INITIAL", "1.0"))
+MIN_RATE = float(os.getenv("RATE_LIMIT_MIN", "0.1"))
+MAX_RATE = float(os.getenv("RATE_LIMIT_MAX", "10.0"))
+# Requests/second added per second's worth of healthy responses.
+INCREASE = float(os.getenv("RATE_LIMIT_INCREASE", "0.1"))
+BACKOFF = float(os.getenv("RATE_LIMIT_BACKOFF", "0.5"))
+LOG_INTERVAL = float(os.getenv("RATE_LIMIT_LOG_INTERVAL", "30"))
+
+# Local fixture and replay servers are never throttled.
+UNLIMITED_HOSTS = {"127.0.0.1", "localhost"}
+
+THROTTLE_STATUSES = {403, 429, 503}
+
+def host_of(url):
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+class TokenBucket:
+    def __init__(self, host, rate=INITIAL_RATE, min_rate=MIN_RATE, max_rate=MAX_RATE):
+        self.host = host
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.last_backoff = 0.0
+        self.ok = 0
+        self.throttled = 0
+
+    def _refill(self, now):
+        # The bucket holds at most one second of traffic, so an idle host
+        # cannot build up a large burst.
+        self.tokens = min(max(self.rate, 1.0), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        # Takes a token right away, going negative if needed, and sleeps off
+        # the debt; concurrent callers queue up without needing a lock.
+        self._refill(time.monotonic())
+        self.tokens -= 1
+        if self.tokens < 0:
+            await asyncio.sleep(-self.tokens / self.rate)
+
+    def success(self):
+        self.ok += 1
+        self.rate = min(self.max_rate, self.rate + INCREASE / self.rate)
+
+    def throttle(self, retry_after=None):
+        self.throttled += 1
+        now = time.monotonic()
+        # Requests that were already in flight when the site pushed back
+        # report the same event; only the first one cuts the rate.
+        if now - self.last_backoff >= 1 / self.rate:
+            self.rate = max(self.min_rate, self.rate * BACKOFF)
+            self.last_backoff = now
+        self._refill(now)
+        pause = retry_after if retry_after is not None else 1 / self.rate
+        self.tokens = min(self.tokens, 1 - pause * self.rate)
+
+class RateLimiter:
+    def __init__(self):
+        self.buckets = {}
+        self.last_log = time.monotonic()
+
+    def bucket(self, url):
+        host = host_of(url)
+        if host in UNLIMITED_HOSTS or not host:
+            return None
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(host)
+        return self.buckets[host]
+
+    async def acquire(self, url):
+        bucket = self.bucket(url)
+        if bucket is not None:
+            await bucket.acquire()
+
+    def record(self, url, healthy, retry_after=None):
+        bucket = self.bucket(url)
+        if bucket is None:
+            return
+        if healthy:
+            bucket.success()
+        else:
+            bucket.throttle(retry_after)
+            print(f"[rate] {bucket.host} pushed back, slowing to {bucket.rate:.2f} req/s")
+        self._maybe_log()
+
+    def record_status(self, url, status, headers=None):
+        # For plain HTTP clients: throttling statuses and 5xx slow the host
+        # down, anything else counts as healthy.
+        if status in THROTTLE_STATUSES or status >= 500:
+            self.record(url, False, retry_after_seconds(headers))
+        else:
+            self.record(url, True)
+
+    def _maybe_log(self):
+        now = time.monotonic()
+        if now - self.last_log >= LOG_INTERVAL:
+            self.last_log = now
+            self.log()
+
+    def log(self):
+        for bucket in self.buckets.values():
+            print(f"[rate] {bucket.host}: {bucket.rate:.2f} req/s ({bucket.ok} ok, {bucket.throttled} throttled)")
+
+def retry_after_seconds(headers):
+    value = (headers or {}).get("retry-after")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+limiter = RateLimiter()
+
+async def rate_limited_navigation(route):
+    # Page route: only top-level documents wait for a token; subresources
+    # pass straight through to the other handlers.
+    if route.request.resource_type == "document":
+        await limiter.acquire(route.request.url)
+    await route.fallback()
+
+async def limited_goto(page, url, **kwargs):
+    # For listing pages, which are not raced through wait_ready: the pool's
+    # route waits for the host's token, and the response, or the failure, is
+    # fed back to the host's bucket here.
+    try:
+        response = await page.goto(url, **kwargs)
+    except Exception:
+        limiter.record(url, False)
+        raise
+    if response is not None:
+        limiter.record_status(url, response.status, response.headers)
+    return response
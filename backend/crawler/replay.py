@@ -0,0 +1,80 @@
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import snapshot_store
+from browser_pool import run_pooled
+from concurrency import concurrency_for
+
+# Re-runs the platform parsers against saved snapshots instead of the live
+# sites, e.g. to check a parser fix against thousands of pages:
+#
+#   CRAWL_SNAPSHOTS=record python thangs/thangs.py      (save while crawling)
+#   python replay.py Thangs 500 thangs.jsonl            (re-extract offline)
+CRAWLER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PARSERS = {
+    "Thingiverse": "thingiverse/get_thing.py",
+    "Printables": "printables/get_info.py",
+    "Thangs": "thangs/get_thangsinfo.py",
+    "CGTrader": "cgtrader/get_cgt.py",
+    "Makerworld": "makerworld/get_make.py",
+    "Pinshape": "pinshape/get_info.py"
+}
+
+def load_parser(platform):
+    # Loaded by path: Printables and Pinshape both call their module get_info.
+    path = os.path.join(CRAWLER_DIR, PARSERS[platform])
+    sys.path.append(os.path.dirname(path))
+    spec = importlib.util.spec_from_file_location(f"{platform.lower()}_parser", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.get_info
+
+async def replay_platform(platform, limit=None, out=None):
+    get_info = load_parser(platform)
+    manifests = list(snapshot_store.get_store().iter_manifests(platform))[:limit]
+    semaphore = asyncio.Semaphore(concurrency_for(platform))
+    counts = {"ok": 0, "empty": 0, "failed": 0}
+    started = time.monotonic()
+
+    async def replay_one(manifest):
+        async with semaphore:
+            try:
+                info = await get_info(manifest["url"])
+            except Exception as e:
+                print(f"Parser failed on {manifest['url']}: {e}")
+                counts["failed"] += 1
+                return
+            if not info or isinstance(info, str):
+                counts["empty"] += 1
+            else:
+                counts["ok"] += 1
+            if out is not None:
+                out.write(json.dumps({"url": manifest["url"], "platform": platform, "info": info}, default=str) + "\n")
+
+    await asyncio.gather(*(replay_one(manifest) for manifest in manifests))
+    elapsed = time.monotonic() - started
+    rate = len(manifests) / elapsed if elapsed else 0
+    print(f"[{platform}] replayed {len(manifests)} snapshots in {elapsed:.1f}s ({rate:.1f} pages/s): {counts}")
+    return counts
+
+async def replay(platforms, limit=None, out_path=None):
+    out = open(out_path, "w") if out_path else None
+    try:
+        for platform in platforms:
+            await replay_platform(platform, limit, out)
+    finally:
+        if out is not None:
+            out.close()
+
+if __name__ == "__main__":
+    snapshot_store.set_mode("replay")
+    platform = sys.argv[1] if len(sys.argv) > 1 else "all"
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    out_path = sys.argv[3] if len(sys.argv) > 3 else None
+    platforms = list(PARSERS) if platform == "all" else [platform]
+    run_pooled(replay(platforms, limit, out_path))
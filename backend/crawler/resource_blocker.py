@@ -0,0 +1,167 @@
+import os
+import random
+
+# get_info only reads DOM text and src attributes, so these never need to be
+# downloaded. Requests to tracker hosts are aborted whatever their type.
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+TRACKER_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "facebook.net",
+    "connect.facebook.com",
+    "hotjar.com",
+    "clarity.ms",
+    "segment.io",
+    "segment.com",
+    "mixpanel.com",
+    "amplitude.com",
+    "intercom.io",
+    "sentry.io",
+    "tiktok.com",
+    "pinterest.com/ct"
+)
+
+# Resource types a platform's DOM needs before its selectors show up.
+# Thingiverse only renders the selected carousel slide once its image loads.
+PLATFORM_ALLOWLIST = {
+    "Thingiverse": {"image"},
+}
+
+BLOCKING_ENABLED = os.getenv("RESOURCE_BLOCKING", "on").lower() != "off"
+
+# Share of pages loaded without blocking so the savings can be measured
+# against real numbers instead of guesses.
+BASELINE_SAMPLE_RATE = float(os.getenv("RESOURCE_BLOCKING_BASELINE_RATE", "0.05"))
+
+# Used for bytes saved until a baseline page has measured the real size.
+DEFAULT_RESOURCE_BYTES = {
+    "image": 80000,
+    "media": 500000,
+    "font": 40000,
+    "tracker": 30000
+}
+
+def _is_tracker(url):
+    return any(host in url for host in TRACKER_HOSTS)
+
+def _category(request):
+    if _is_tracker(request.url):
+        return "tracker"
+    return request.resource_type
+
+class BlockingStats:
+    def __init__(self, platform):
+        self.platform = platform
+        self.blocked = {}
+        self.blocked_pages = 0
+        self.blocked_load_ms = 0.0
+        self.baseline_pages = 0
+        self.baseline_load_ms = 0.0
+        self.baseline_bytes = {}
+        self.baseline_counts = {}
+
+    def average_bytes(self, category):
+        count = self.baseline_counts.get(category, 0)
+        if count:
+            return self.baseline_bytes[category] / count
+        return DEFAULT_RESOURCE_BYTES.get(category, 0)
+
+    def bytes_saved(self):
+        return sum(count * self.average_bytes(category) for category, count in self.blocked.items())
+
+    def load_ms_saved(self):
+        if not self.blocked_pages or not self.baseline_pages:
+            return None
+        per_page = self.baseline_load_ms / self.baseline_pages - self.blocked_load_ms / self.blocked_pages
+        return per_page * self.blocked_pages
+
+    def report(self):
+        blocked_requests = sum(self.blocked.values())
+        saved_ms = self.load_ms_saved()
+        saved_time = f"{saved_ms / 1000:.1f}s" if saved_ms is not None else "n/a (no baseline pages)"
+        return (
+            f"[{self.platform}] blocked {blocked_requests} requests on {self.blocked_pages} pages "
+            f"({self.blocked}), ~{self.bytes_saved() / 1024 / 1024:.1f} MB saved, "
+            f"page-load time saved: {saved_time}"
+        )
+
+stats = {}
+
+def stats_for(platform):
+    if platform not in stats:
+        stats[platform] = BlockingStats(platform)
+    return stats[platform]
+
+class BlockingSession:
+    def __init__(self, page, platform):
+        self.page = page
+        self.platform = platform
+        self.stats = stats_for(platform)
+        self.allowed = PLATFORM_ALLOWLIST.get(platform, set())
+        self.baseline = random.random() < BASELINE_SAMPLE_RATE
+
+    def _should_block(self, request):
+        category = _category(request)
+        if category == "tracker":
+            return True
+        return category in BLOCKED_RESOURCE_TYPES and category not in self.allowed
+
+    async def _route(self, route):
+        request = route.request
+        if self._should_block(request):
+            category = _category(request)
+            self.stats.blocked[category] = self.stats.blocked.get(category, 0) + 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _measure(self, request):
+        if not self._should_block(request):
+            return
+        try:
+            sizes = await request.sizes()
+        except Exception:
+            return
+        category = _category(request)
+        self.stats.baseline_bytes[category] = self.stats.baseline_bytes.get(category, 0) + sizes["responseBodySize"]
+        self.stats.baseline_counts[category] = self.stats.baseline_counts.get(category, 0) + 1
+
+    async def install(self):
+        if self.baseline:
+            self.page.on("requestfinished", self._measure)
+        else:
+            await self.page.route("**/*", self._route)
+
+    async def finish(self):
+        try:
+            load_ms = await self.page.evaluate("""
+                () => {
+                    const nav = performance.getEntriesByType('navigation')[0];
+                    if (!nav) return null;
+                    return nav.loadEventEnd || nav.domContentLoadedEventEnd || null;
+                }
+            """)
+        except Exception:
+            load_ms = None
+        if not load_ms:
+            return
+        if self.baseline:
+            self.stats.baseline_pages += 1
+            self.stats.baseline_load_ms += load_ms
+        else:
+            self.stats.blocked_pages += 1
+            self.stats.blocked_load_ms += load_ms
+
+async def apply_blocking(page, platform):
+    if not BLOCKING_ENABLED or platform is None:
+        return None
+    session = BlockingSession(page, platform)
+    await session.install()
+    return session
+
+def report_blocking():
+    for platform_stats in stats.values():
+        print(platform_stats.report())
+    stats.clear()
@@ -0,0 +1,44 @@
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+# Default mapping from a card anchor to the fields the crawlers need.
+CARD_HREF_JS = "els => els.map(el => ({href: el.getAttribute('href')}))"
+
+GROWTH_JS = """
+    ([selector, count, height]) =>
+        document.querySelectorAll(selector).length > count ||
+        document.body.scrollHeight > height
+"""
+
+async def harvest_batches(page, selector, extract_js=CARD_HREF_JS, settle_timeout=5000, max_idle_scrolls=2):
+    # Yields the cards matching `selector` that each scroll batch adds, as a
+    # list, so callers can check a whole batch against the catalogue at once.
+    # Instead of sleeping a fixed time per scroll it waits until the card
+    # count or page height grows, and stops after `max_idle_scrolls` scrolls
+    # in a row bring nothing new. The consumer can simply stop iterating once
+    # it has enough; no further scrolling happens.
+    seen = set()
+    idle = 0
+    scroll_count = 0
+    while True:
+        cards = await page.eval_on_selector_all(selector, extract_js)
+        batch = []
+        for card in cards:
+            if card.get("href") in seen:
+                continue
+            seen.add(card.get("href"))
+            batch.append(card)
+        if batch:
+            yield batch
+        count = len(cards)
+
+        height = await page.evaluate("document.body.scrollHeight")
+        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+        try:
+            await page.wait_for_function(GROWTH_JS, arg=[selector, count, height], timeout=settle_timeout)
+            idle = 0
+        except PlaywrightTimeoutError:
+            idle += 1
+            if idle >= max_idle_scrolls:
+                break
+        scroll_count += 1
+        print(f"Scrolled {scroll_count} times, {len(seen)} cards so far...")
@@ -0,0 +1,226 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+
+# Detail pages can be saved here while crawling (CRAWL_SNAPSHOTS=record) and
+# served back to the parsers later without touching the network
+# (CRAWL_SNAPSHOTS=replay, or replay.py). Bodies are gzipped and stored under
+# their sha256, so re-recording an unchanged page costs no extra disk; each
+# URL has a small JSON manifest pointing at its latest HTML and JSON bodies.
+SNAPSHOT_DIR = os.getenv(
+    "CRAWL_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+)
+SNAPSHOT_MODE = os.getenv("CRAWL_SNAPSHOTS", "off").lower()
+# JSON responses bigger than this are not worth keeping.
+JSON_CAPTURE_LIMIT = int(os.getenv("CRAWL_SNAPSHOT_JSON_BYTES", str(2 * 1024 * 1024)))
+
+# Scripts are dropped on replay: the saved DOM is already rendered, and
+# re-running the site's code against it would try to fetch its bundles.
+# JSON data islands (__NEXT_DATA__, ld+json) are kept.
+EXECUTABLE_SCRIPT = re.compile(
+    r'<script\b(?![^>]*type="application/(?:ld\+)?json")[^>]*>.*?</script>',
+    re.DOTALL | re.IGNORECASE
+)
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+class SnapshotStore:
+    def __init__(self, root=SNAPSHOT_DIR):
+        self.root = root
+        self.objects = os.path.join(root, "objects")
+        self.manifests = os.path.join(root, "manifests")
+        os.makedirs(self.objects, exist_ok=True)
+        os.makedirs(self.manifests, exist_ok=True)
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects, digest[:2], digest + ".gz")
+
+    def _manifest_path(self, url):
+        return os.path.join(self.manifests, _digest(url.encode("utf-8")) + ".json")
+
+    def _write_atomic(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def put_blob(self, data):
+        digest = _digest(data)
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            self._write_atomic(path, gzip.compress(data))
+        return digest
+
+    def get_blob(self, digest):
+        with open(self._object_path(digest), "rb") as f:
+            return gzip.decompress(f.read())
+
+    def save(self, url, platform, html, responses=(), final_url=None):
+        manifest = {
+            "url": url,
+            "final_url": final_url or url,
+            "platform": platform,
+            "captured_at": time.time(),
+            "html": self.put_blob(html.encode("utf-8")),
+            "responses": [
+                {
+                    "url": response["url"],
+                    "status": response["status"],
+                    "content_type": response["content_type"],
+                    "body": self.put_blob(response["body"])
+                }
+                for response in responses
+            ]
+        }
+        self._write_atomic(self._manifest_path(url), json.dumps(manifest).encode("utf-8"))
+        return manifest
+
+    def load(self, url):
+        try:
+            with open(self._manifest_path(url)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def html(self, manifest):
+        return self.get_blob(manifest["html"]).decode("utf-8")
+
+    def iter_manifests(self, platform=None):
+        for name in sorted(os.listdir(self.manifests)):
+            if not name.endswith(".json"):
+                continue
+            with open(os.path.join(self.manifests, name)) as f:
+                manifest = json.load(f)
+            if platform is None or manifest["platform"] == platform:
+                yield manifest
+
+    def disk_usage(self):
+        files = 0
+        size = 0
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                files += 1
+                size += os.path.getsize(os.path.join(directory, name))
+        return files, size
+
+class SnapshotRecorder:
+    # Remembers the page's first main-frame navigation and every JSON
+    # XHR/fetch response, then saves them with the final DOM when the page
+    # is handed back to the pool.
+    def __init__(self, store, page, platform):
+        self.store = store
+        self.page = page
+        self.platform = platform
+        self.url = None
+        self.responses = []
+        self.pending = []
+
+    def install(self):
+        self.page.on("request", self._on_request)
+        self.page.on("response", self._on_response)
+
+    def _on_request(self, request):
+        if self.url is None and request.is_navigation_request() and request.frame == self.page.main_frame:
+            self.url = request.url
+
+    def _on_response(self, response):
+        if response.request.resource_type not in ("xhr", "fetch"):
+            return
+        if "json" not in response.headers.get("content-type", ""):
+            return
+        self.pending.append(asyncio.ensure_future(self._capture(response)))
+
+    async def _capture(self, response):
+        body = await response.body()
+        if len(body) <= JSON_CAPTURE_LIMIT:
+            self.responses.append({
+                "url": response.url,
+                "status": response.status,
+                "content_type": response.headers.get("content-type"),
+                "body": body
+            })
+
+    async def finish(self):
+        if self.url is None or self.page.is_closed():
+            return
+        await asyncio.gather(*self.pending, return_exceptions=True)
+        try:
+            html = await self.page.content()
+        except Exception as e:
+            print(f"Could not snapshot {self.url}: {e}")
+            return
+        await asyncio.to_thread(self.store.save, self.url, self.platform, html, self.responses, self.page.url)
+
+class SnapshotReplay:
+    # Serves navigations and captured JSON from the store and aborts every
+    # other request, so replayed pages never reach the network.
+    def __init__(self, store, page):
+        self.store = store
+        self.page = page
+        self.responses = {}
+        self.misses = []
+
+    async def install(self):
+        await self.page.route("**/*", self._route)
+
+    async def _route(self, route):
+        request = route.request
+        if request.resource_type == "document":
+            manifest = await asyncio.to_thread(self.store.load, request.url)
+            if manifest is None:
+                self.misses.append(request.url)
+                await route.abort()
+                return
+            for response in manifest["responses"]:
+                self.responses[response["url"]] = response
+            html = EXECUTABLE_SCRIPT.sub("", self.store.html(manifest))
+            await route.fulfill(status=200, content_type="text/html; charset=utf-8", body=html)
+            return
+        response = self.responses.get(request.url)
+        if response is not None:
+            await route.fulfill(
+                status=response["status"],
+                content_type=response["content_type"],
+                body=self.store.get_blob(response["body"])
+            )
+            return
+        await route.abort()
+
+    async def finish(self):
+        for url in self.misses:
+            print(f"No snapshot for {url}")
+
+_store = None
+_mode = SNAPSHOT_MODE
+
+def set_mode(mode):
+    global _mode
+    _mode = mode
+
+def replaying():
+    return _mode == "replay"
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = SnapshotStore()
+    return _store
+
+async def attach_snapshots(page, platform):
+    # Only pages borrowed for a platform's detail parser are snapshotted.
+    if platform is None or _mode not in ("record", "replay"):
+        return None
+    if _mode == "replay":
+        replay = SnapshotReplay(get_store(), page)
+        await replay.install()
+        return replay
+    recorder = SnapshotRecorder(get_store(), page, platform)
+    recorder.install()
+    return recorder
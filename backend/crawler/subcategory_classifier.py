@@ -0,0 +1,201 @@
+import asyncio
+import json
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+import psycopg2
+
+# TF-IDF nearest-centroid classifier over the catalogue's own models, used to
+# answer obvious subcategories ("christmas ornament", "benchy calibration")
+# without asking the LLM. Only predictions whose best centroid beats the
+# runner-up by SUBCATEGORY_CONFIDENCE are used; the rest go to the LLM.
+MODEL_PATH = os.getenv(
+    "SUBCATEGORY_MODEL",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "subcategory_model.json")
+)
+CLASSIFIER_ENABLED = os.getenv("SUBCATEGORY_CLASSIFIER", "on").lower() != "off"
+CONFIDENCE_THRESHOLD = float(os.getenv("SUBCATEGORY_CONFIDENCE", "0.15"))
+MIN_EXAMPLES = int(os.getenv("SUBCATEGORY_MIN_EXAMPLES", "5"))
+MAX_AGE = float(os.getenv("SUBCATEGORY_MODEL_MAX_AGE_HOURS", "24")) * 3600
+# Terms kept per centroid; the long tail adds size but almost no signal.
+CENTROID_TERMS = 300
+# Title words say the most about what a model is.
+TITLE_WEIGHT = 2
+
+STOPWORDS = {
+    "the", "and", "for", "with", "this", "that", "you", "your", "are", "can", "from", "was", "will",
+    "has", "have", "not", "all", "its", "into", "our", "any", "but", "one", "use", "used", "also",
+    "print", "printed", "printing", "model", "models", "3d", "stl", "file", "files"
+}
+
+TRAINING_QUERY = """
+    SELECT m.title, m.description, m.tags, s.name
+    FROM "Model" m
+    JOIN "SubCategory" s ON m."subCategoryId" = s.id
+    WHERE NOT m.deleted AND s.name != 'Other'
+"""
+
+def connect():
+    return psycopg2.connect(dbname="projectdb", user="postgres", password="mypassword", host="localhost", port="5432")
+
+def tokenize(text):
+    return [token for token in re.findall(r"[a-z0-9]{2,}", (text or "").lower()) if token not in STOPWORDS]
+
+def document_terms(title, description, tags):
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    terms = Counter(tokenize(title) * TITLE_WEIGHT)
+    terms.update(tokenize(description))
+    for tag in tags or []:
+        terms.update(tokenize(tag))
+    return terms
+
+def _normalize(vector):
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+class SubcategoryClassifier:
+    def __init__(self, idf, centroids, taxonomy, trained_at=None):
+        self.idf = idf
+        self.centroids = centroids
+        self.taxonomy = taxonomy
+        self.trained_at = trained_at or time.time()
+        self.predictions = 0
+        self.answered = 0
+
+    @classmethod
+    def train(cls, rows, taxonomy):
+        # rows: (title, description, tags, subcategory name)
+        documents = [(document_terms(title, description, tags), subcategory) for title, description, tags, subcategory in rows]
+        document_frequency = Counter()
+        for terms, _ in documents:
+            document_frequency.update(terms.keys())
+        total = len(documents)
+        idf = {term: math.log((1 + total) / (1 + count)) + 1 for term, count in document_frequency.items()}
+
+        sums = defaultdict(Counter)
+        examples = Counter()
+        for terms, subcategory in documents:
+            vector = _normalize({term: (1 + math.log(count)) * idf[term] for term, count in terms.items()})
+            sums[subcategory].update(vector)
+            examples[subcategory] += 1
+        centroids = {}
+        for subcategory, summed in sums.items():
+            if examples[subcategory] < MIN_EXAMPLES:
+                continue
+            centroids[subcategory] = _normalize(dict(summed.most_common(CENTROID_TERMS)))
+        return cls(idf, centroids, taxonomy)
+
+    @classmethod
+    def from_database(cls, cursor, taxonomy):
+        cursor.execute(TRAINING_QUERY)
+        return cls.train(cursor.fetchall(), taxonomy)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        with open(path) as f:
+            data = json.load(f)
+        return cls(data["idf"], data["centroids"], data["taxonomy"], data["trained_at"])
+
+    def save(self, path=MODEL_PATH):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"idf": self.idf, "centroids": self.centroids, "taxonomy": self.taxonomy, "trained_at": self.trained_at}, f)
+        os.replace(tmp_path, path)
+
+    def predict(self, title, description, tags):
+        # Returns (subcategory, confidence), confidence being how far the
+        # best centroid's cosine similarity beats the runner-up's.
+        terms = document_terms(title, description, tags)
+        vector = _normalize({term: (1 + math.log(count)) * self.idf[term] for term, count in terms.items() if term in self.idf})
+        if not vector:
+            return None, 0.0
+        scores = sorted(
+            ((sum(weight * centroid.get(term, 0.0) for term, weight in vector.items()), subcategory)
+             for subcategory, centroid in self.centroids.items()),
+            reverse=True
+        )
+        if not scores:
+            return None, 0.0
+        best, subcategory = scores[0]
+        runner_up = scores[1][0] if len(scores) > 1 else 0.0
+        return subcategory, best - runner_up
+
+    def classify(self, data, threshold=CONFIDENCE_THRESHOLD):
+        # The subcategory when confident enough, otherwise None for the LLM.
+        # Training rows hold the rewritten descriptions and image tags while
+        # new items have the source ones; the title carries most of the
+        # weight either way.
+        self.predictions += 1
+        subcategory, confidence = self.predict(data.get("title"), data.get("description"), data.get("tags"))
+        if subcategory is None or confidence < threshold:
+            return None
+        self.answered += 1
+        return subcategory
+
+    def report(self):
+        if self.predictions:
+            print(f"[classifier] answered {self.answered}/{self.predictions} subcategories locally "
+                  f"({self.answered / self.predictions:.0%} LLM calls avoided, threshold {CONFIDENCE_THRESHOLD})")
+
+_classifier = None
+_loading = None
+
+def load_or_train(taxonomy):
+    # Loads the saved model unless it is stale or built for another taxonomy,
+    # in which case it is retrained from the catalogue on its own connection
+    # and saved.
+    if os.path.exists(MODEL_PATH):
+        saved = SubcategoryClassifier.load()
+        if saved.taxonomy == taxonomy and time.time() - saved.trained_at < MAX_AGE:
+            return saved
+    conn = connect()
+    try:
+        with conn.cursor() as cursor:
+            classifier = SubcategoryClassifier.from_database(cursor, taxonomy)
+    finally:
+        conn.close()
+    classifier.save()
+    print(f"[classifier] trained on {len(classifier.centroids)} subcategories")
+    return classifier
+
+async def get_classifier(taxonomy):
+    # Loading or training runs in a thread, once, so the crawl's event loop
+    # keeps going; enrich workers asking meanwhile wait for the same result.
+    # None when it could not be loaded.
+    global _classifier, _loading
+    if _classifier is not None:
+        return _classifier
+    loop = asyncio.get_running_loop()
+    if _loading is None or _loading[0] is not loop:
+        _loading = (loop, loop.create_task(asyncio.to_thread(load_or_train, taxonomy)))
+    try:
+        _classifier = await _loading[1]
+    except Exception as e:
+        # The LLM answers until a later call manages to load it.
+        print(f"[classifier] unavailable: {e}")
+        _loading = None
+    return _classifier
+
+def report_classifier():
+    if _classifier is not None:
+        _classifier.report()
+
+if __name__ == "__main__":
+    # Holds out every fifth model and prints how often confident predictions
+    # are right and how many would skip the LLM at a few thresholds.
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute(TRAINING_QUERY)
+    rows = cur.fetchall()
+    train_rows = [row for i, row in enumerate(rows) if i % 5]
+    test_rows = [row for i, row in enumerate(rows) if not i % 5]
+    classifier = SubcategoryClassifier.train(train_rows, None)
+    predictions = [(classifier.predict(title, description, tags), actual) for title, description, tags, actual in test_rows]
+    for threshold in (0.05, 0.1, 0.15, 0.2, 0.3):
+        answered = [(predicted, actual) for (predicted, confidence), actual in predictions if predicted and confidence >= threshold]
+        correct = sum(predicted == actual for predicted, actual in answered)
+        print(f"threshold {threshold}: answers {len(answered)}/{len(test_rows)}, "
+              f"accuracy {correct / len(answered) if answered else 0:.1%}")
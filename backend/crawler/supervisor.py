@@ -0,0 +1,208 @@
+import asyncio
+import collections
+import importlib.util
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import traceback
+CRAWLER_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(CRAWLER_DIR)
+
+# Runs work units across N worker processes, each with its own event loop and
+# browser pools, so parsing and the browser drivers use more than one core.
+# A unit is a platform plus the arguments of its crawl function, e.g.
+#
+#   [{"platform": "Thangs", "args": ["Fashion", "Clothing", 20]},
+#    {"platform": "Printables", "args": [26, 20]}]
+#
+#   python supervisor.py units.json 4
+#
+# Workers share the SQLite frontier, whose claims keep two processes off the
+# same URL. Thingiverse scans keep a single checkpoint file, so a second
+# Thingiverse unit waits until the running one finishes.
+WORKERS = int(os.getenv("CRAWL_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+MAX_UNIT_ATTEMPTS = int(os.getenv("CRAWL_UNIT_ATTEMPTS", "2"))
+
+HANDLERS = {
+    "Thingiverse": ("thingiverse/thingiverse.py", "scan_thingiverse"),
+    "Printables": ("printables/printables.py", "scrape_printables"),
+    "Thangs": ("thangs/thangs.py", "crawl_thangs"),
+    "CGTrader": ("cgtrader/cgtrader.py", "crawl_cgtrader"),
+    "Makerworld": ("makerworld/makerworld.py", "crawl_makerworld"),
+    "Pinshape": ("pinshape/pinshape.py", "scrape_pinshape")
+}
+
+# Platforms that run at most one unit at a time across all workers.
+EXCLUSIVE_PLATFORMS = {"Thingiverse"}
+
+_handlers = {}
+
+def load_handler(platform):
+    # Platform scripts import their parser by a bare module name, and
+    # Printables and Pinshape both call theirs get_info, so each platform's
+    # directory goes first on the path and the cached parser is dropped.
+    if platform not in _handlers:
+        path, name = HANDLERS[platform]
+        path = os.path.join(CRAWLER_DIR, path)
+        sys.path.insert(0, os.path.dirname(path))
+        sys.modules.pop("get_info", None)
+        spec = importlib.util.spec_from_file_location(f"{platform.lower()}_crawl", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _handlers[platform] = getattr(module, name)
+    return _handlers[platform]
+
+def _summary(result):
+    if isinstance(result, list):
+        return len(result)
+    return result
+
+async def _worker_loop(worker_id, tasks, results):
+    from browser_pool import close_pools
+    try:
+        while True:
+            unit = await asyncio.to_thread(tasks.get)
+            if unit is None:
+                return
+            started = time.monotonic()
+            try:
+                result = await load_handler(unit["platform"])(*unit.get("args", []))
+                stats = {"items": _summary(result), "elapsed": round(time.monotonic() - started, 1)}
+                results.put(("done", worker_id, unit, stats))
+            except Exception as e:
+                traceback.print_exc()
+                results.put(("failed", worker_id, unit, {"error": str(e), "elapsed": round(time.monotonic() - started, 1)}))
+    finally:
+        await close_pools()
+
+def worker_main(worker_id, tasks, results):
+    asyncio.run(_worker_loop(worker_id, tasks, results))
+
+class Supervisor:
+    def __init__(self, units, workers=WORKERS, max_attempts=MAX_UNIT_ATTEMPTS):
+        self.ctx = multiprocessing.get_context("spawn")
+        self.results = self.ctx.Queue()
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.units = collections.deque(units)
+        self.pending = len(units)
+        # Each worker has its own task queue, so the supervisor always knows
+        # which unit a worker was running when it died.
+        self.processes = {}
+        self.task_queues = {}
+        self.in_flight = {}
+        self.attempts = {}
+        self.outcomes = []
+        self.restarts = 0
+        self.next_worker_id = 0
+
+    def _start_worker(self):
+        worker_id = self.next_worker_id
+        self.next_worker_id += 1
+        tasks = self.ctx.Queue()
+        process = self.ctx.Process(target=worker_main, args=(worker_id, tasks, self.results), daemon=True)
+        process.start()
+        self.processes[worker_id] = process
+        self.task_queues[worker_id] = tasks
+        print(f"[supervisor] worker {worker_id} started (pid {process.pid})")
+
+    def _unit_key(self, unit):
+        return json.dumps(unit, sort_keys=True)
+
+    def _next_unit(self):
+        # The first queued unit that may start now; units of an exclusive
+        # platform that is already running keep their place in the queue.
+        running = {unit["platform"] for unit in self.in_flight.values()}
+        for unit in self.units:
+            if unit["platform"] not in EXCLUSIVE_PLATFORMS or unit["platform"] not in running:
+                self.units.remove(unit)
+                return unit
+        return None
+
+    def _assign(self):
+        for worker_id in self.processes:
+            if worker_id in self.in_flight:
+                continue
+            unit = self._next_unit()
+            if unit is None:
+                return
+            key = self._unit_key(unit)
+            self.attempts[key] = self.attempts.get(key, 0) + 1
+            self.in_flight[worker_id] = unit
+            self.task_queues[worker_id].put(unit)
+
+    def _handle(self, message):
+        kind, worker_id, unit, stats = message
+        self.in_flight.pop(worker_id, None)
+        self.pending -= 1
+        self.outcomes.append({"unit": unit, "worker": worker_id, "status": kind, **stats})
+        print(f"[supervisor] worker {worker_id} {kind} {unit}: {stats}")
+
+    def _drain(self):
+        while True:
+            try:
+                self._handle(self.results.get_nowait())
+            except queue.Empty:
+                return
+
+    def _reap(self):
+        # Replaces dead workers and puts the unit they were running back on
+        # the queue, unless it has already killed a worker too many times.
+        # Messages a worker sent just before dying are read first, so a unit
+        # it finished is not run again.
+        self._drain()
+        for worker_id, process in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            del self.processes[worker_id]
+            del self.task_queues[worker_id]
+            unit = self.in_flight.pop(worker_id, None)
+            print(f"[supervisor] worker {worker_id} exited with code {process.exitcode}")
+            if unit is not None:
+                if self.attempts[self._unit_key(unit)] < self.max_attempts:
+                    self.units.appendleft(unit)
+                else:
+                    self.pending -= 1
+                    self.outcomes.append({"unit": unit, "worker": worker_id, "status": "crashed", "exitcode": process.exitcode})
+            if self.pending > len(self.processes):
+                self.restarts += 1
+                self._start_worker()
+
+    def run(self):
+        for _ in range(min(self.workers, self.pending)):
+            self._start_worker()
+        while self.pending > 0:
+            self._assign()
+            try:
+                self._handle(self.results.get(timeout=1))
+            except queue.Empty:
+                pass
+            self._reap()
+        for tasks in self.task_queues.values():
+            tasks.put(None)
+        for process in self.processes.values():
+            process.join(timeout=60)
+            if process.is_alive():
+                process.terminate()
+        self.report()
+        return self.outcomes
+
+    def report(self):
+        counts = {}
+        for outcome in self.outcomes:
+            counts[outcome["status"]] = counts.get(outcome["status"], 0) + 1
+        print(f"[supervisor] {len(self.outcomes)} units: {counts}, {self.restarts} worker restarts")
+        for platform in sorted({outcome["unit"]["platform"] for outcome in self.outcomes}):
+            done = [o for o in self.outcomes if o["unit"]["platform"] == platform and o["status"] == "done"]
+            items = sum(o["items"] for o in done if isinstance(o["items"], int))
+            elapsed = sum(o["elapsed"] for o in done)
+            print(f"  {platform}: {len(done)} units done, {items} items in {elapsed:.0f}s of worker time")
+
+if __name__ == "__main__":
+    with open(sys.argv[1]) as f:
+        units = json.load(f)
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else WORKERS
+    Supervisor(units, workers).run()
@@ -0,0 +1,68 @@
+import base64
+import io
+import os
+from collections import OrderedDict
+import httpx
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# The image sent to the vision model for tags. The carousel's small variant
+# (image_urls[i][1]) is plenty to recognise the object, costs less to fetch,
+# and with "low" detail the model bills a fixed small number of tokens.
+# Platforms whose images the API cannot fetch directly are downloaded, shrunk
+# to TAG_IMAGE_MAX_SIDE when Pillow is installed, and sent inline.
+TAG_IMAGE_MAX_SIDE = int(os.getenv("TAG_IMAGE_MAX_SIDE", "512"))
+TAG_IMAGE_DETAIL = os.getenv("TAG_IMAGE_DETAIL", "low")
+TAG_IMAGE_CACHE_SIZE = int(os.getenv("TAG_IMAGE_CACHE_SIZE", "256"))
+INLINE_PLATFORMS = {"Thingiverse"}
+
+# Prepared payloads by source URL, so retries and repeated enrichments of the
+# same model do not download and encode it again.
+_prepared = OrderedDict()
+
+def pick_variant(image_urls):
+    big, small = (list(image_urls[0]) + [None, None])[:2]
+    return small or big
+
+def downscale(content):
+    # Returns (bytes, mime type); the original when Pillow is missing or the
+    # image is already small enough.
+    if Image is None:
+        return content, "image/jpeg"
+    try:
+        image = Image.open(io.BytesIO(content))
+        if max(image.size) <= TAG_IMAGE_MAX_SIDE:
+            return content, Image.MIME.get(image.format, "image/jpeg")
+        image.thumbnail((TAG_IMAGE_MAX_SIDE, TAG_IMAGE_MAX_SIDE))
+        out = io.BytesIO()
+        image.convert("RGB").save(out, format="JPEG", quality=85)
+        return out.getvalue(), "image/jpeg"
+    except Exception as e:
+        print(f"Could not downscale tag image: {e}")
+        return content, "image/jpeg"
+
+async def inline_image(url):
+    async with httpx.AsyncClient(timeout=30) as client:
+        resp = await client.get(url)
+        resp.raise_for_status()
+    content, mime = downscale(resp.content)
+    return f"data:{mime};base64,{base64.b64encode(content).decode('utf-8')}"
+
+async def prepare_tag_image(data):
+    url = pick_variant(data['image_urls'])
+    if data['platform'] not in INLINE_PLATFORMS:
+        return url
+    if url in _prepared:
+        _prepared.move_to_end(url)
+        return _prepared[url]
+    prepared = await inline_image(url)
+    _prepared[url] = prepared
+    if len(_prepared) > TAG_IMAGE_CACHE_SIZE:
+        _prepared.popitem(last=False)
+    return prepared
+
+def image_part(image_url):
+    return {"type": "image_url", "image_url": {"url": image_url, "detail": TAG_IMAGE_DETAIL}}
@@ -0,0 +1,78 @@
+import asyncio
+import functools
+import json
+import os
+import sys
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+psycopg2 = pytest.importorskip("psycopg2")
+pytest.importorskip("openai")
+
+# backfill reads the subcategory list from projectdb when ai_enricher is
+# imported; the "Model" table itself is never written, update_models is
+# replaced below.
+try:
+    import backfill
+except psycopg2.OperationalError:
+    pytest.skip("projectdb is not reachable", allow_module_level=True)
+from backfill import BackfillState, LocalBatches
+
+MODELS = [
+    ("model-full", {"title": "Full answer", "description": "A vase", "source_url": "https://example.com/full"}),
+    ("model-partial", {"title": "Partial answer", "description": "A hook", "source_url": "https://example.com/partial"}),
+    ("model-junk", {"title": "Junk answer", "description": "A gear", "source_url": "https://example.com/junk"})
+]
+
+@pytest.fixture
+def subcategory():
+    if not backfill.subcategory_to_category:
+        pytest.skip("projectdb has no subcategories")
+    return next(iter(backfill.subcategory_to_category))
+
+def responder(subcategory, body):
+    # Answers by the title in the prompt: every field valid, only the
+    # description valid, or nothing usable.
+    prompt = body["messages"][0]["content"][0]["text"]
+    if "Full answer" in prompt:
+        return {"description": "A tall vase", "subcategory": subcategory, "tags": ["vase", "decor"]}
+    if "Partial answer" in prompt:
+        return {"description": "A wall hook", "subcategory": "Not a subcategory", "tags": "hook"}
+    return {"description": " ", "tags": []}
+
+def test_local_batches_apply_valid_fields_and_survive_restart(tmp_path, monkeypatch, subcategory):
+    directory = str(tmp_path)
+    updated = []
+    monkeypatch.setattr(backfill, "update_models", lambda rows: updated.extend(rows))
+    monkeypatch.setattr(backfill, "category_ids", lambda: {subcategory: ("cat-1", "sub-1")})
+    monkeypatch.setattr(backfill, "BACKENDS", {"local": lambda: LocalBatches(functools.partial(responder, subcategory))})
+    monkeypatch.setattr(backfill, "BackfillState", functools.partial(BackfillState, directory))
+    monkeypatch.setattr(backfill, "POLL_SECONDS", 0)
+
+    # Prepare and submit, then stop as if the process had been killed.
+    state = BackfillState(directory)
+    assert len(backfill.prepare(state, MODELS)) == 1
+    asyncio.run(backfill.submit_written(state, "local"))
+    assert len(state.batches("submitted")) == 1
+    state.close()
+
+    # A fresh run picks the submitted batch up from the state file.
+    asyncio.run(backfill.run("local"))
+
+    rows = {row[0]: row for row in updated}
+    assert rows["model-full"] == ("model-full", "A tall vase", "cat-1", "sub-1", ["vase", "decor"])
+    # Invalid fields stay NULL, so the current values are kept.
+    assert rows["model-partial"] == ("model-partial", "A wall hook", None, None, None)
+    assert "model-junk" not in rows
+
+    state = BackfillState(directory)
+    batches, items = state.counts()
+    assert dict(batches) == {"applied": 1}
+    assert dict(items) == {"applied": 2, "failed": 1}
+
+    # The next pass only retries the model that failed.
+    new_batches = backfill.prepare(state, MODELS)
+    with open(state.batches("written")[0]["input_path"]) as f:
+        requests = [json.loads(line) for line in f]
+    assert len(new_batches) == 1
+    assert [request["custom_id"] for request in requests] == ["model-junk"]
+    state.close()
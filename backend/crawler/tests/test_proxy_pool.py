@@ -0,0 +1,113 @@
+import asyncio
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import proxy_pool
+from proxy_pool import ProxyPool, MAX_CONSECUTIVE_FAILURES
+
+# Two local stand-in proxies: one answers every request, the other refuses
+# every one with a 403 like a banned exit node. Chromium and urllib both send
+# plain-http requests to the proxy with the absolute URL, so the stand-ins
+# never reach the network.
+TARGET_URL = "http://crawl.test/listing"
+PAGE = b"<html><body><div id='ok'>ok</div></body></html>"
+
+class StandInProxy:
+    def __init__(self, status):
+        hits = self.hits = []
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                hits.append(self.path)
+                body = PAGE if status == 200 else b"refused"
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.proxy = {"server": f"http://127.0.0.1:{self.server.server_port}"}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def proxies():
+    bad, good = StandInProxy(403), StandInProxy(200)
+    yield bad, good
+    bad.close()
+    good.close()
+
+def fetch(proxy):
+    opener = urllib.request.build_opener(urllib.request.ProxyHandler({"http": proxy["server"]}))
+    try:
+        with opener.open(TARGET_URL, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def test_failing_proxy_is_benched_and_new_contexts_move_to_healthy(proxies):
+    bad, good = proxies
+    # The refusing proxy is listed first, so it wins the tie between two
+    # untried proxies.
+    pool = ProxyPool([bad.proxy, good.proxy])
+    used = []
+    for _ in range(4):
+        # Each "context" serves a few pages on its proxy, or fewer if that
+        # proxy is benched first, as BrowserPool does.
+        health = pool.choose()
+        used.append(health.server)
+        for _ in range(MAX_CONSECUTIVE_FAILURES):
+            if not pool.available(health):
+                break
+            status = fetch(health.proxy)
+            health.record(status not in proxy_pool.PROXY_FAILURE_STATUSES, 10.0)
+
+    bad_health, good_health = pool.health
+    assert used[0] == bad.proxy["server"]
+    assert bad_health.benched == 1
+    assert len(bad.hits) == MAX_CONSECUTIVE_FAILURES
+    assert used[1:] == [good.proxy["server"]] * 3
+    assert good_health.failures == 0
+    assert pool.choose() is good_health
+
+def test_browser_pool_moves_contexts_off_failing_proxy(proxies):
+    pytest.importorskip("playwright")
+    import browser_pool
+    from rate_limiter import TokenBucket, limiter
+
+    bad, good = proxies
+    browser_pool.HEADLESS = True
+    limiter.buckets["crawl.test"] = TokenBucket("crawl.test", rate=100)
+    pool = browser_pool.BrowserPool(proxies=ProxyPool([bad.proxy, good.proxy]), size=1, contexts_per_browser=1)
+
+    async def load():
+        async with pool.page() as page:
+            response = await page.goto(TARGET_URL, timeout=10000)
+            # Let the probe's requestfinished handler run before the page closes.
+            await asyncio.sleep(0.2)
+            return response.status
+
+    async def main():
+        try:
+            return [await load() for _ in range(MAX_CONSECUTIVE_FAILURES + 2)]
+        finally:
+            await pool.close()
+
+    statuses = asyncio.run(main())
+    bad_health, good_health = pool.proxies.health
+    assert statuses[:MAX_CONSECUTIVE_FAILURES] == [403] * MAX_CONSECUTIVE_FAILURES
+    assert statuses[MAX_CONSECUTIVE_FAILURES:] == [200, 200]
+    assert bad_health.benched == 1
+    assert len(good.hits) == 2
@@ -1,6 +1,11 @@
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from urllib.parse import urlparse, parse_qs, urlencode, urlunparse
-import asyncio
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from browser_pool import borrow_page, run_pooled, INFATICA_PROXY
+from extract_schema import validate
+from page_ready import wait_ready
+from typing import List, Optional, TypedDict
 
 def get_quality_from_url(url):
     parsed_url = urlparse(url)
@@ -45,76 +50,85 @@ def get_image_num(text):
         return 1
 
 
+class ThangsPage(TypedDict):
+    title: str
+    description: str
+    page_count: Optional[str]
+    active_images: List[Optional[str]]
+    thumbnails: List[Optional[str]]
+    tags: List[str]
+    member: bool
+    paid: bool
+    prices: List[str]
+
+READY_SELECTORS = [
+    'h1[class^="ModelTitle_Text"]',
+    'div.markdown',
+    'div.swiper-slide.swiper-slide-active img, img[class*="ModelThumbnail_img"]'
+]
+
+EXTRACT_JS = """
+    () => {
+        const all = (selector) => [...document.querySelectorAll(selector)];
+        const pageCounts = all('div[class*="ImageViewer_PageCount"]');
+        const buyPrimary = document.querySelector('button[class*="SubscribeButton"][class*="Button"][class*="Button__primary"]');
+        const buySecondary = document.querySelector('button[class*="SubscribeButton"][class*="Button"][class*="Button__secondary"]');
+        const member = document.querySelector('button[class*="SubscribeButton"][class*="Model_ViewPlans"][class*="Button"][class*="Button__primary"]');
+        return {
+            title: document.querySelector('h1[class^="ModelTitle_Text"]').innerText,
+            description: document.querySelector('div.markdown').innerText,
+            page_count: (pageCounts[1] ?? pageCounts[0])?.innerText ?? null,
+            active_images: all('div.swiper-slide.swiper-slide-active img').map(img => img.getAttribute('src')),
+            thumbnails: all('img[class*="ModelThumbnail_img"][class*="ModelThumbnail_img_regular"][data-nimg="1"]')
+                .map(img => img.getAttribute('src')),
+            tags: all('span[class^="ModelDetails_TagText"]').map(tag => tag.innerText),
+            member: Boolean(member),
+            paid: Boolean((buyPrimary && !member) || buySecondary),
+            prices: all('span[class*="Model_Price"]').map(span => span.innerText)
+        };
+    }
+"""
+
 async def get_info(url):
     
-    user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
-
     info = []
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(
-            headless=False,
-            proxy={
-                "server": "http://pool.infatica.io:10000",
-                "username": "C0aeX1JZjKzfxgTQDpbG",
-                "password": "yl9xbHM8"
-            } 
-        )  # Set to True to hide the browser
-        page = await browser.new_page(user_agent=user_agent, 
-            viewport={"width": 1280, "height": 800},
-            locale="en-US"
-        )
-
+    async with borrow_page(proxy=INFATICA_PROXY, platform="Thangs") as page:
         try:
-            await page.goto(url, timeout=60000, wait_until="domcontentloaded")
-
-            await page.wait_for_selector('h1[class^="ModelTitle_Text"]')
-            title = await page.locator('h1[class^="ModelTitle_Text"]').inner_text()
+            response = await page.goto(url, timeout=60000, wait_until="domcontentloaded")
 
-            description = await page.locator('div.markdown').inner_text()
+            ready = await wait_ready(page, READY_SELECTORS, response=response, platform="Thangs")
+            if not ready.ok:
+                return None
+            data = validate(await page.evaluate(EXTRACT_JS), ThangsPage)
 
-            locator = page.locator('div[class*="ImageViewer_PageCount"]')
-
-            if await locator.count() > 0:
-                text = await locator.nth(1).inner_text()
-                image_num = get_image_num(text)
-            else:
-                image_num = 1
+            title = data["title"]
+            description = data["description"]
+            image_num = get_image_num(data["page_count"]) if data["page_count"] else 1
             
             img_urls = []
 
             if image_num == 1:
-                await page.wait_for_selector('div.swiper-slide.swiper-slide-active img')
-                img_url = await page.locator('div.swiper-slide.swiper-slide-active img').nth(1).get_attribute('src')
+                active_images = data["active_images"]
+                img_url = active_images[1] if len(active_images) > 1 else active_images[0]
                 if get_quality_from_url(img_url) == "75":
-                    img_url = await page.locator('div.swiper-slide.swiper-slide-active img').first.get_attribute('src')
+                    img_url = active_images[0]
                 s_img_url = update_quality_from_url(img_url)
                 img_urls.append([img_url, s_img_url])
             else:
-                thumb_elements = page.locator('img[class*="ModelThumbnail_img"][class*="ModelThumbnail_img_regular"][data-nimg="1"]')
-                for i in range(await thumb_elements.count()):
-                    img_url = await thumb_elements.nth(i).get_attribute('src')
+                for img_url in data["thumbnails"]:
                     b_img_url = update_quality_from_url(img_url)
                     img_urls.append([b_img_url, img_url])
                 print(img_urls)
             
             thumbnail_url = thumbnail_url_from_url(img_urls[0][0])
 
+            tags = data["tags"]
 
-            tag_elements = await page.query_selector_all('span[class^="ModelDetails_TagText"]')
-            tags = [await tag_element.inner_text() for tag_element in tag_elements]
-            
-            price_type1_el = await page.query_selector('button[class*="SubscribeButton"][class*="Button"][class*="Button__primary"]')
-            price_type2_el = await page.query_selector('button[class*="SubscribeButton"][class*="Button"][class*="Button__secondary"]')
-            member_el = await page.query_selector('button[class*="SubscribeButton"][class*="Model_ViewPlans"][class*="Button"][class*="Button__primary"]')
-            if not member_el:
-                price_type1_el = price_type1_el
-            else:
-                price_type1_el = None
-            if price_type1_el or price_type2_el:
-                full_price = await page.locator('span[class*="Model_Price"]').nth(1).inner_text()
+            if data["paid"]:
+                full_price = data["prices"][1]
                 price = full_price.replace("USD", "").strip()
-            elif member_el:
+            elif data["member"]:
                 price = "Premium"
             else:
                 price = "Free"
@@ -129,10 +143,8 @@ async def get_info(url):
             return info
         except Exception as e:
             return f"Error loading page: {e}"
-        finally:
-            await browser.close()
 
 if __name__ == "__main__":
     url = 'https://thangs.com/designer/3dprintbunny/3d-model/Ramadan%20String%20Art-1030820'
-    result = asyncio.run(get_info(url))
+    result = run_pooled(get_info(url))
     print(result)
\ No newline at end of file
@@ -1,66 +1,120 @@
-from playwright.async_api import async_playwright
-import asyncio
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from browser_pool import borrow_page, run_pooled
+from extract_schema import validate
+from page_ready import wait_ready
+from typing import List, Optional, TypedDict
+
+class ThingiversePage(TypedDict):
+    title: str
+    description: str
+    tags: List[str]
+    selected_src: Optional[str]
+    thumb_src: Optional[str]
+    carousel: Optional[List[List[str]]]
+
+SELECTED_IMG = 'li.slide.selected img.mediaItem--image'
+SELECTED_THUMB = 'div[class*="CarouselThumbnails__selected"] img.mediaItem--image'
+
+READY_SELECTORS = [
+    'h1[title]',
+    'div[class*="DetailDescriptionSummary__detailDescriptionSummary"]',
+    SELECTED_IMG,
+    SELECTED_THUMB
+]
+ERROR_SELECTORS = ['div[class*="Layout__errorPage"]']
+# Tags can render after the rest of the page, and models without tags have no
+# list at all, so it gets its own bounded wait instead of gating readiness.
+TAG_LIST = 'div[class*="TagList__tagList"]'
+TAG_LIST_TIMEOUT = 3000
+
+# Every slide and thumbnail is already in the DOM, so the whole carousel is
+# read at once, starting from the selected slide like the click-through did.
+# Returns null when slides and thumbnails cannot be paired up, in which case
+# get_info falls back to clicking through the carousel.
+CAROUSEL_JS = """
+    () => {
+        const fromSelected = (items, selected) => {
+            const start = Math.max(items.indexOf(selected), 0);
+            const sources = [];
+            for (const item of items.slice(start)) {
+                const src = item.querySelector('img.mediaItem--image')?.getAttribute('src');
+                if (!src) return null;
+                if (!sources.includes(src)) sources.push(src);
+            }
+            return sources;
+        };
+
+        const selectedSlide = document.querySelector('li.slide.selected');
+        const slides = [...selectedSlide.parentElement.querySelectorAll(':scope > li.slide')];
+        const selectedThumb = document.querySelector('div[class*="CarouselThumbnails__selected"]');
+        const thumbs = [...selectedThumb.parentElement.children];
+
+        const images = fromSelected(slides, selectedSlide);
+        const thumbnails = fromSelected(thumbs, selectedThumb);
+        if (!images || !thumbnails || images.length !== thumbnails.length) return null;
+        return images.map((src, i) => [src, thumbnails[i]]);
+    }
+"""
+
+EXTRACT_JS = f"""
+    () => ({{
+        title: document.querySelector('h1[title]').innerText,
+        description: document.querySelector('div[class*="DetailDescriptionSummary__detailDescriptionSummary"]').innerText,
+        tags: [...document.querySelectorAll('{TAG_LIST} span.button-content')].map(tag => tag.innerText),
+        selected_src: document.querySelector('li.slide.selected img.mediaItem--image').getAttribute('src'),
+        thumb_src: document.querySelector('div[class*="CarouselThumbnails__selected"] img.mediaItem--image').getAttribute('src'),
+        carousel: (() => {{ try {{ return ({CAROUSEL_JS})(); }} catch (e) {{ return null; }} }})()
+    }})
+"""
+
+async def click_through_carousel(page, image_urls):
+    while True:
+        try:
+            await page.click('button[aria-label="next slide / item"]')
+            await page.wait_for_timeout(500)
+            await page.wait_for_selector(SELECTED_IMG)
+            selected_img = page.locator(SELECTED_IMG)
+            await page.wait_for_selector(SELECTED_THUMB)
+            selected_thumb = page.locator(SELECTED_THUMB)
 
-async def get_info(url):
-    user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
+            selected_src = await selected_img.get_attribute('src')
+            thumb_src = await selected_thumb.get_attribute('src')
+            image_urls.append([selected_src, thumb_src])
+        except:
+            break
+    return image_urls
 
+async def get_info(url):
     info = []
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)  # Set to True to hide the browser
-        page = await browser.new_page(user_agent=user_agent, 
-            viewport={"width": 1280, "height": 800},
-            locale="en-US"
-        )
-
+    async with borrow_page(platform="Thingiverse") as page:
         try:
-            await page.goto(url, timeout=60000, wait_until="domcontentloaded")
+            response = await page.goto(url, timeout=60000, wait_until="domcontentloaded")
 
-            try:
-                await page.wait_for_selector('div[class*="Layout__errorPage"]', timeout=3000)
+            ready = await wait_ready(page, READY_SELECTORS, ERROR_SELECTORS, response=response, platform="Thingiverse")
+            if not ready.ok:
                 return None
-            except:
-                pass
-
-            await page.wait_for_selector('h1[title]')
-            title = await page.locator('h1[title]').inner_text()
-
-            await page.wait_for_selector('div[class*="DetailDescriptionSummary__detailDescriptionSummary"]')
-            description = await page.locator('div[class*="DetailDescriptionSummary__detailDescriptionSummary"]').inner_text()
-
             try:
-                await page.wait_for_selector('div[class*="TagList__tagList"]', timeout=3000)
-                tag_elements = page.locator('div[class*="TagList__tagList"] span.button-content')
-                tags = await tag_elements.all_inner_texts()
-            except:
-                tags= []
-            
-
-            image_urls = []
-            await page.wait_for_selector('li.slide.selected img.mediaItem--image')
-            selected_img = page.locator('li.slide.selected img.mediaItem--image')
-            await page.wait_for_selector('div[class*="CarouselThumbnails__selected"] img.mediaItem--image')
-            selected_thumb = page.locator('div[class*="CarouselThumbnails__selected"] img.mediaItem--image')
+                await page.wait_for_selector(TAG_LIST, timeout=TAG_LIST_TIMEOUT)
+            except PlaywrightTimeoutError:
+                print("No tags found")
 
-            selected_src = await selected_img.get_attribute('src')
-            thumb_src = await selected_thumb.get_attribute('src')
-            image_urls.append([selected_src, thumb_src])
+            data = validate(await page.evaluate(EXTRACT_JS), ThingiversePage)
+            title = data["title"]
+            description = data["description"]
+            tags = data["tags"]
+
+            thumb_src = data["thumb_src"]
             info.append({"thumbnail_url" : thumb_src})
 
-            while True:
-                try:
-                    await page.click('button[aria-label="next slide / item"]')
-                    await page.wait_for_timeout(500)
-                    await page.wait_for_selector('li.slide.selected img.mediaItem--image')
-                    selected_img = page.locator('li.slide.selected img.mediaItem--image')
-                    await page.wait_for_selector('div[class*="CarouselThumbnails__selected"] img.mediaItem--image')
-                    selected_thumb = page.locator('div[class*="CarouselThumbnails__selected"] img.mediaItem--image')
-
-                    selected_src = await selected_img.get_attribute('src')
-                    thumb_src = await selected_thumb.get_attribute('src')
-                    image_urls.append([selected_src, thumb_src])
-                except:
-                    break
+            if data["carousel"]:
+                image_urls = data["carousel"]
+            else:
+                print("Carousel could not be read in one step, clicking through it")
+                image_urls = await click_through_carousel(page, [[data["selected_src"], thumb_src]])
 
             info.append({"title" : title})
             info.append({"description" : description})
@@ -72,11 +126,9 @@ async def get_info(url):
         except Exception as e:
             print(f"Error loading page: {e}")
             return None
-        finally:
-            await browser.close()
 
 if __name__ == "__main__":
     url = 'https://www.thingiverse.com/thing:8'
-    result = asyncio.run(get_info(url))
+    result = run_pooled(get_info(url))
 
     print(result)
\ No newline at end of file
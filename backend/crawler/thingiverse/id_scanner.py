@@ -0,0 +1,135 @@
+import httpx
+import asyncio
+import json
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rate_limiter import limiter
+
+# Thing IDs are checked through the public API when a token is configured;
+# a 404 there means the thing was deleted or never existed, so no browser is
+# needed. Without a token every ID is left to the full render.
+THINGIVERSE_API = "https://api.thingiverse.com/things/{}"
+THINGIVERSE_TOKEN = os.getenv("THINGIVERSE_TOKEN")
+
+SHARD_COUNT = int(os.getenv("THINGIVERSE_SHARDS", "4"))
+CHECKPOINT_PATH = os.getenv(
+    "THINGIVERSE_CHECKPOINT",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "scan_checkpoint.json")
+)
+
+# Returned by the handler for an ID another live run is still working on.
+# The shard stops there without moving its checkpoint past the ID, so the
+# next scan comes back to it.
+UNCLAIMED = object()
+
+def split_range(start, end, count):
+    total = end - start + 1
+    if total <= 0:
+        return []
+    count = max(1, min(count, total))
+    size, extra = divmod(total, count)
+    shards = []
+    current = start
+    for i in range(count):
+        length = size + (1 if i < extra else 0)
+        shards.append({"start": current, "end": current + length - 1, "next": current})
+        current += length
+    return shards
+
+class Checkpoint:
+    def __init__(self, path=CHECKPOINT_PATH):
+        self.path = path
+        self.shards = []
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            self.shards = json.load(f)["shards"]
+        return True
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"shards": self.shards}, f)
+        os.replace(tmp_path, self.path)
+
+    def plan(self, start, end, count):
+        # Resume unfinished shards, then cover any IDs published since the
+        # checkpoint was written with fresh shards.
+        if self.load():
+            covered_to = max((shard["end"] for shard in self.shards), default=start - 1)
+            self.shards = [shard for shard in self.shards if shard["next"] <= shard["end"]]
+            self.shards += split_range(max(start, covered_to + 1), end, count)
+        else:
+            self.shards = split_range(start, end, count)
+        self.save()
+        return self.shards
+
+    def advance(self, shard, thing_id):
+        shard["next"] = thing_id + 1
+        self.save()
+
+    def finished(self):
+        return all(shard["next"] > shard["end"] for shard in self.shards)
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+async def thing_exists(client, thing_id):
+    # True/False when the API answers, None when it cannot tell.
+    if not THINGIVERSE_TOKEN:
+        return None
+    url = THINGIVERSE_API.format(thing_id)
+    await limiter.acquire(url)
+    try:
+        response = await client.get(url)
+    except httpx.HTTPError:
+        limiter.record(url, False)
+        return None
+    limiter.record_status(url, response.status_code, response.headers)
+    if response.status_code == 404:
+        return False
+    if response.status_code != 200:
+        return None
+    body = response.json()
+    return not body.get("is_private") and body.get("is_published", True) is not False
+
+async def scan_ids(start, end, handle, num, shard_count=SHARD_COUNT, checkpoint=None):
+    checkpoint = checkpoint or Checkpoint()
+    shards = checkpoint.plan(start, end, shard_count)
+    collected = []
+    stats = {"checked": 0, "missing": 0, "rendered": 0}
+    headers = {"Authorization": f"Bearer {THINGIVERSE_TOKEN}"} if THINGIVERSE_TOKEN else {}
+
+    async with httpx.AsyncClient(headers=headers, timeout=15) as client:
+        async def worker(shard):
+            while shard["next"] <= shard["end"] and len(collected) < num:
+                thing_id = shard["next"]
+                stats["checked"] += 1
+                exists = await thing_exists(client, thing_id)
+                if exists is False:
+                    stats["missing"] += 1
+                else:
+                    stats["rendered"] += 1
+                    try:
+                        url = await handle(thing_id)
+                    except Exception as e:
+                        print(f"Skipping thing:{thing_id} because of error: {e}")
+                        url = None
+                    if url is UNCLAIMED:
+                        print(f"thing:{thing_id} is held by another run, stopping shard at it")
+                        return
+                    if url:
+                        collected.append(url)
+                checkpoint.advance(shard, thing_id)
+
+        print(f"Scanning {len(shards)} shards: {[(s['next'], s['end']) for s in shards]}")
+        await asyncio.gather(*(worker(shard) for shard in shards))
+
+    print(f"Checked {stats['checked']} IDs, {stats['missing']} missing, {stats['rendered']} rendered, {len(collected)} collected")
+    if checkpoint.finished():
+        checkpoint.clear()
+    return collected
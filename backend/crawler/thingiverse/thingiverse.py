@@ -1,33 +1,28 @@
-from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 import asyncio
 from get_thing import get_info
+from id_scanner import scan_ids, SHARD_COUNT, UNCLAIMED
 import re
 import os
 import sys
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 sys.path.append(project_root)
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from src.utils.injection import inject_database, url_exists_in_db, find_thingiverse_stpoint
+from src.utils.injection import inject_database, find_thingiverse_stpoint
+from src.utils.fingerprint import fingerprint
 from ai_enricher import enrich_data
+from browser_pool import borrow_page, run_pooled
+from rate_limiter import limited_goto
+from pipeline import merge_info, report_enrichment, run_recrawl
+from frontier import Frontier, FETCHED, ENRICHED, INJECTED, FAILED
 
-user_agent = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
-
-async def scrape_thingiverse(num):
-    collected_url = []
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False)  # Set headless=True if you don't want the browser to show
-        page = await browser.new_page(
-            user_agent=user_agent, 
-            viewport={"width": 1280, "height": 800},
-            locale="en-US"
-        )
-
+async def find_newest_thing_id():
+    # Borrowed from the browser pool, so it shares the per-host rate limiting.
+    async with borrow_page() as page:
         try:
-            await page.goto("https://www.thingiverse.com/?page=1&sort=newest", timeout=60000, wait_until="domcontentloaded")
+            await limited_goto(page, "https://www.thingiverse.com/?page=1&sort=newest", timeout=60000, wait_until="domcontentloaded")
         except PlaywrightTimeoutError:
             print(f"Attempt failed to load: ")
-        
-        maxId = 0
 
         await page.wait_for_selector('a[href*="/thing:"]', timeout=10000, state="attached")
         link = await page.query_selector('a[href*="/thing:"]')
@@ -37,33 +32,80 @@ async def scrape_thingiverse(num):
         maxId = int(match.group(1))
         print(maxId)
 
-        current = find_thingiverse_stpoint() + 1
+        return maxId
+
+async def process_thing(thing_id, frontier=None, claimed=False):
+    # With a frontier, the thing is claimed first so an overlapping scan
+    # never processes it twice, and its progress is recorded. claimed: the
+    # caller already holds the claim, e.g. for leftovers from the frontier.
+    url = f"https://www.thingiverse.com/thing:{thing_id}"
+    mark = frontier.mark if frontier is not None else (lambda *args: None)
+    if frontier is not None and not claimed:
+        frontier.add("Thingiverse", url)
+        if not frontier.claim(url):
+            # Finished or out of attempts; otherwise still being worked on.
+            return UNCLAIMED if frontier.held_elsewhere(url) else None
+    try:
+        info = await get_info(url)
+        if info is None:
+            mark(url, FAILED, "no data")
+            return None
+        mark(url, FETCHED)
+        merged_info = merge_info(info)
+        merged_info["source_url"] = url
+        merged_info["platform"] = "Thingiverse"
+        merged_info["content_hash"], merged_info["field_hashes"] = fingerprint(merged_info)
+        res = await enrich_data(merged_info)
+        if res == None:
+            mark(url, FAILED, "no result from enrich")
+            return None
+        mark(url, ENRICHED)
+        await inject_database(res)
+        mark(url, INJECTED)
+        return url
+    except Exception as e:
+        mark(url, FAILED, str(e))
+        raise
+
+async def resume_things(frontier, num, workers=SHARD_COUNT):
+    # Retries things left claimed by a crashed run or failed earlier, up to
+    # num of them.
+    pending = frontier.claim_pending("Thingiverse", num)
+    if pending:
+        print(f"[Thingiverse] resuming {len(pending)} URLs from the frontier")
+    semaphore = asyncio.Semaphore(workers)
+
+    async def resume(url):
+        async with semaphore:
+            try:
+                return await process_thing(int(re.search(r'thing:(\d+)', url).group(1)), frontier, claimed=True)
+            except Exception as e:
+                print(f"Skipping {url} because of error: {e}")
+                return None
+
+    results = await asyncio.gather(*(resume(url) for url, _ in pending))
+    return len(pending), [url for url in results if url]
 
-        while len(collected_url) < num:
-            url = f"https://www.thingiverse.com/thing:{(current)}"
-            info = await get_info(url)
-            if info is not None:
-                merged_info = {}
-                for item in info:
-                    if isinstance(item, dict):
-                        merged_info.update(item)
-                merged_info["source_url"] = url
-                merged_info["platform"] = "Thingiverse"
-                res = enrich_data(merged_info)
-                if res == None:
-                    continue
-                else:
-                    await inject_database(res)
-                collected_url.append(url)
-            current += 1
+async def scan_thingiverse(num, shards=SHARD_COUNT):
+    # Resumes the frontier's leftovers, then splits the unscanned ID range
+    # across parallel workers, resuming from the checkpoint file if a
+    # previous scan was interrupted. Resumed things count against num.
+    frontier = Frontier()
+    try:
+        attempted, collected = await resume_things(frontier, num, shards)
+        if attempted >= num:
+            return collected
+        maxId = await find_newest_thing_id()
+        start = find_thingiverse_stpoint() + 1
+        return collected + await scan_ids(start, maxId, lambda thing_id: process_thing(thing_id, frontier), num - attempted, shard_count=shards)
+    finally:
+        report_enrichment()
+        frontier.close()
 
-            if current > maxId:
-                print("Reached last modelID")
-                break
-        
-        await browser.close()
+async def recrawl_thingiverse(num, concurrency=None):
+    return await run_recrawl("Thingiverse", get_info, num, fetch_workers=concurrency)
 
 if __name__ == "__main__":
     # num = int(sys.argv[1])
-    # results = asyncio.run(scrape_thingiverse(num))
-    results = asyncio.run(scrape_thingiverse(1))
\ No newline at end of file
+    # results = run_pooled(scan_thingiverse(num))
+    results = run_pooled(scan_thingiverse(1))
\ No newline at end of file
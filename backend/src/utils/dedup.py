@@ -0,0 +1,47 @@
+import hashlib
+
+def _fingerprint(url):
+    # 8-byte digest instead of the full URL keeps a large catalogue's index
+    # to a few MB; collisions are negligible at 64 bits.
+    return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+class KnownUrls:
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self._platforms = {}
+        self.queries = 0
+
+    def _load(self, platform):
+        if platform in self._platforms:
+            return self._platforms[platform]
+        self.cursor.execute(
+            """SELECT m."sourceUrl" FROM "Model" m
+               JOIN "SourceSite" s ON m."sourceSiteId" = s.id
+               WHERE s.name = %s""",
+            (platform,)
+        )
+        self.queries += 1
+        known = {_fingerprint(row[0]) for row in self.cursor.fetchall()}
+        self._platforms[platform] = known
+        print(f"Loaded {len(known)} known {platform} source URLs")
+        return known
+
+    def contains(self, platform, url):
+        return _fingerprint(url) in self._load(platform)
+
+    def add(self, platform, url):
+        self._load(platform).add(_fingerprint(url))
+
+    def filter_new(self, platform, urls):
+        # Drops URLs already in the catalogue. Anything the in-memory index
+        # does not know is re-checked with one query for the whole batch, which
+        # also catches models injected by another process since startup.
+        known = self._load(platform)
+        candidates = list(dict.fromkeys(url for url in urls if url and _fingerprint(url) not in known))
+        if not candidates:
+            return []
+        self.cursor.execute('SELECT "sourceUrl" FROM "Model" WHERE "sourceUrl" = ANY(%s)', (candidates,))
+        self.queries += 1
+        for (url,) in self.cursor.fetchall():
+            known.add(_fingerprint(url))
+        return [url for url in candidates if _fingerprint(url) not in known]
@@ -0,0 +1,44 @@
+import ast
+import hashlib
+import json
+import re
+import unicodedata
+
+# Scraped fields that decide whether a model changed on the source site.
+# Hashes are taken from the raw scrape, before AI enrichment rewrites the
+# description and tags, so the same page always gives the same fingerprint.
+FINGERPRINT_FIELDS = ("title", "description", "tags", "image_urls", "price")
+
+def _text(value):
+    value = unicodedata.normalize("NFKC", str(value or ""))
+    return re.sub(r"\s+", " ", value).strip()
+
+def _normalize(field, value):
+    if field == "tags":
+        if isinstance(value, str):
+            value = value.split(",")
+        return sorted({_text(tag).lower() for tag in value or [] if _text(tag)})
+    if field == "image_urls":
+        if isinstance(value, str):
+            value = ast.literal_eval(value)
+        return [[_text(url) for url in pair] for pair in value or []]
+    if field == "price":
+        return _text(value).lower()
+    return _text(value)
+
+def field_hashes(record):
+    hashes = {}
+    for field in FINGERPRINT_FIELDS:
+        normalized = json.dumps(_normalize(field, record.get(field)), ensure_ascii=False)
+        hashes[field] = hashlib.sha256(normalized.encode("utf-8")).hexdigest()[:16]
+    return hashes
+
+def content_hash(hashes):
+    return hashlib.sha256(json.dumps(hashes, sort_keys=True).encode("utf-8")).hexdigest()
+
+def fingerprint(record):
+    hashes = field_hashes(record)
+    return content_hash(hashes), hashes
+
+def changed_fields(old_hashes, new_hashes):
+    return [field for field in FINGERPRINT_FIELDS if (old_hashes or {}).get(field) != new_hashes.get(field)]
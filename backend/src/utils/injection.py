@@ -8,6 +8,7 @@ import boto3
 import asyncio
 import os
 from .convertPrice import parse_price_to_value
+from .dedup import KnownUrls
 from dotenv import load_dotenv
 import re
 
@@ -35,6 +36,10 @@ conn = psycopg2.connect(
 
 cursor = conn.cursor()
 
+# Source URLs already in the catalogue, per platform; kept up to date by
+# inject_database so listing loops do not need a query per card.
+known_urls = KnownUrls(cursor)
+
 def url_exists_in_db(href):
     query = 'SELECT 1 FROM "Model" WHERE "sourceUrl" = %s'
     cursor.execute(query, (href,))
@@ -93,50 +98,123 @@ def sanitize_filename(filename: str) -> str:
     filename = filename.strip().replace(" ", "_")
     return filename
 
+def _image_key(data, model_id, folder):
+    return data['platform'] + f"/{model_id}/{folder}/" + sanitize_filename(data['title']) + "_" + data['tags'][0] + ".png"
+
+async def upload_images(data, model_id):
+    # Copies the thumbnail and carousel to Backblaze and returns their public URLs.
+    key_path = _image_key(data, model_id, "thumb")
+    full_path = base_url + key_path
+    await transfer_image_to_backblaze(data['thumbnail_url'], '3ddatabase', key_path)
+    image_urls = []
+    for i in range(len(data['image_urls'])):
+        big_path = _image_key(data, model_id, f"carousel/big/{i+1}")
+        small_path = _image_key(data, model_id, f"carousel/small/{i+1}")
+        await transfer_image_to_backblaze(data['image_urls'][i][0], '3ddatabase', big_path)
+        await transfer_image_to_backblaze(data['image_urls'][i][1], '3ddatabase', small_path)
+        full_big_path = base_url + big_path
+        full_small_path = base_url + small_path
+        image_urls.append([full_big_path, full_small_path])
+    return full_path, image_urls
+
+def _category_ids(data):
+    cursor.execute('SELECT id FROM "Category" WHERE name=%s', (data['category'],))
+    category_id = cursor.fetchone()[0]
+    if data['category'] == 'Other':
+        cursor.execute('SELECT id FROM "SubCategory" WHERE name=%s', ("Other",))
+        subcategory_id = cursor.fetchone()[0]
+    else:
+        cursor.execute('SELECT id FROM "SubCategory" WHERE name=%s', (data['subcategory'],))
+        subcategory_id = cursor.fetchone()[0]
+    return category_id, subcategory_id
+
+def _prepare_data(data):
+    if isinstance(data['tags'], str):
+        data['tags'] = [tag.strip() for tag in data['tags'].split(',')]
+    if isinstance(data['image_urls'], str):
+        data['image_urls'] = ast.literal_eval(data['image_urls'])
+
 async def inject_database(data):
+    # Raises when the model could not be stored, so the caller marks the URL
+    # failed and retries it instead of recording it as injected.
     now = datetime.utcnow()
     try:
         cursor.execute('SELECT id FROM "SourceSite" WHERE name = %s', (data['platform'],))
         source_site_id = cursor.fetchone()[0]
-        cursor.execute('SELECT id FROM "Category" WHERE name=%s', (data['category'],))
-        category_id = cursor.fetchone()[0]
-        if data['category'] == 'Other':
-            cursor.execute('SELECT id FROM "SubCategory" WHERE name=%s', ("Other",))
-            subcategory_id = cursor.fetchone()[0]
-        else:
-            cursor.execute('SELECT id FROM "SubCategory" WHERE name=%s', (data['subcategory'],))
-            subcategory_id = cursor.fetchone()[0]
-        data['tags'] = [tag.strip() for tag in data['tags'].split(',')]
-        if isinstance(data['image_urls'], str):
-            data['image_urls'] = ast.literal_eval(data['image_urls'])
-        model_id = generate_unique_id()
-        key_path = data['platform'] + f"/{model_id}/thumb/" + sanitize_filename(data['title']) + "_" + data['tags'][0] + ".png"
-        full_path = base_url + key_path
-        try:
-            await transfer_image_to_backblaze(data['thumbnail_url'], '3ddatabase', key_path)
-            image_urls = []
-            for i in range(len(data['image_urls'])):
-                big_path = data['platform'] + f"/{model_id}/carousel/big/{i+1}/" + sanitize_filename(data['title']) + "_" + data['tags'][0] + ".png"
-                small_path = data['platform'] + f"/{model_id}/carousel/small/{i+1}/" + sanitize_filename(data['title']) + "_" + data['tags'][0] + ".png"
-                await transfer_image_to_backblaze(data['image_urls'][i][0], '3ddatabase', big_path)
-                await transfer_image_to_backblaze(data['image_urls'][i][1], '3ddatabase', small_path)
-                full_big_path = base_url + big_path
-                full_small_path = base_url + small_path
-                image_urls.append([full_big_path, full_small_path])
-            cursor.execute(
-                """INSERT INTO "Model" (id, "sourceSiteId", title, description, "categoryId", "subCategoryId", tags, "sourceUrl", "thumbnailUrl", "imagesUrl", price, "priceValue", "createdAt", "updatedAt")
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT ("sourceUrl") Do NOTHING
-                """,
-                (model_id, source_site_id, data['title'], data['description'], category_id, subcategory_id, 
-                data['tags'],data['source_url'],full_path, Json(image_urls), data['price'],  parse_price_to_value(data['price']),now, now)
-            )
-            conn.commit()
-        except:
-            print(f"Skipping model {data['title']} because of error: {e}")
-            conn.rollback()
-
-        
+        category_id, subcategory_id = _category_ids(data)
     except psycopg2.Error as e:
         print(f"Error adding source site: {e}")
-        conn.rollback()
\ No newline at end of file
+        conn.rollback()
+        raise
+    _prepare_data(data)
+    model_id = generate_unique_id()
+    try:
+        full_path, image_urls = await upload_images(data, model_id)
+        cursor.execute(
+            """INSERT INTO "Model" (id, "sourceSiteId", title, description, "categoryId", "subCategoryId", tags, "sourceUrl", "thumbnailUrl", "imagesUrl", price, "priceValue", "contentHash", "fieldHashes", "createdAt", "updatedAt")
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                ON CONFLICT ("sourceUrl") Do NOTHING
+            """,
+            (model_id, source_site_id, data['title'], data['description'], category_id, subcategory_id, 
+            data['tags'],data['source_url'],full_path, Json(image_urls), data['price'],  parse_price_to_value(data['price']),
+            data.get('content_hash'), Json(data['field_hashes']) if data.get('field_hashes') else None, now, now)
+        )
+        conn.commit()
+        known_urls.add(data['platform'], data['source_url'])
+    except Exception as e:
+        print(f"Skipping model {data['title']} because of error: {e}")
+        conn.rollback()
+        raise
+
+def get_fingerprint(source_url):
+    cursor.execute(
+        'SELECT id, "contentHash", "fieldHashes" FROM "Model" WHERE "sourceUrl" = %s', (source_url,)
+    )
+    return cursor.fetchone()
+
+def source_urls_for_recrawl(platform, limit=None):
+    # Least recently updated first, so repeated partial recrawls cycle
+    # through the whole catalogue.
+    cursor.execute(
+        """SELECT m."sourceUrl" FROM "Model" m
+           JOIN "SourceSite" s ON m."sourceSiteId" = s.id
+           WHERE s.name = %s AND NOT m.deleted
+           ORDER BY m."updatedAt" LIMIT %s""",
+        (platform, limit)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+async def update_model(model_id, data, changed):
+    # Writes back only the columns derived from the fields that changed on
+    # the source site; images are re-uploaded only when the carousel changed.
+    now = datetime.utcnow()
+    columns = {}
+    try:
+        _prepare_data(data)
+        if "title" in changed or "description" in changed:
+            category_id, subcategory_id = _category_ids(data)
+            columns.update({
+                "title": data['title'],
+                "description": data['description'],
+                '"categoryId"': category_id,
+                '"subCategoryId"': subcategory_id
+            })
+        if "image_urls" in changed:
+            full_path, image_urls = await upload_images(data, model_id)
+            columns.update({"tags": data['tags'], '"thumbnailUrl"': full_path, '"imagesUrl"': Json(image_urls)})
+        if "price" in changed:
+            columns.update({"price": data['price'], '"priceValue"': parse_price_to_value(data['price'])})
+        columns.update({
+            '"contentHash"': data['content_hash'],
+            '"fieldHashes"': Json(data['field_hashes']),
+            '"updatedAt"': now
+        })
+        assignments = ", ".join(f"{column} = %s" for column in columns)
+        cursor.execute(
+            f'UPDATE "Model" SET {assignments} WHERE id = %s', (*columns.values(), model_id)
+        )
+        conn.commit()
+    except Exception as e:
+        print(f"Skipping update of {data['source_url']} because of error: {e}")
+        conn.rollback()
+        raise